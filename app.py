@@ -1,134 +1,91 @@
-
 import streamlit as st
+from streamlit.errors import StreamlitInvalidLayoutContextError
 import pandas as pd
-import io, zipfile, re
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from ingest import load_table, slot_table, hora_min, norm_dia, map_unique, content_hash
+from store import AssignmentStore, diff_assignments, save_turma, save_docente, save_disc_ano
+from rules import RuleSet
+from engine import build_ledger, cargos_atr_df, n_turmas_credito, CARGAS_COLS
+from solver import auto_distribuir_async, reset_pool
+from horarios import ScheduleIndex, cross_check, fmt_hora
+from export import export_zip_bytes
+from importer import read_distribuicao, validate_distribuicao, import_distribuicao
+from workspace import open_workspace, WorkspaceEmUso, WORKSPACE_DIR, NOME_RE
+from search import DocenteIndex
+from scenarios import scenario_grid, sweep, IMPUTACOES
+from coverage import CoverageCube, DIMS as COB_DIMS
+import profiling
+from profiling import Profiler, stage
+from graph import Graph
+from history import History
 
 st.set_page_config(page_title="Distribuição de Serviço Docente — Completa", layout="wide")
 
-# ======================================================
-# Robust CSV reader + header normalization + aliases
-# ======================================================
-def read_csv_robust(file_or_bytes, filename="upload"):
-    if hasattr(file_or_bytes, "read"):
-        data = file_or_bytes.read()
-    elif isinstance(file_or_bytes, (bytes, bytearray)):
-        data = bytes(file_or_bytes)
-    else:
-        with open(file_or_bytes, "rb") as f:
-            data = f.read()
-    encodings = ["utf-8", "utf-8-sig", "cp1252", "latin-1"]
-    seps = [None, ";", ",", "\t", "|"]
-    for enc in encodings:
-        for sep in seps:
-            try:
-                bio = io.BytesIO(data)
-                if sep is None:
-                    df = pd.read_csv(bio, sep=None, engine="python", encoding=enc)
-                else:
-                    df = pd.read_csv(bio, sep=sep, engine="python", encoding=enc)
-                if df.shape[1] >= 1:
-                    return df
-            except Exception:
-                continue
-    return None
-
-def normalize_cols(df):
-    mapping = {}
-    for c in df.columns:
-        key = re.sub(r'[^a-z0-9]+','', str(c).strip().lower())
-        mapping[c] = key
-    return df.rename(columns=mapping)
-
-ALIASES_DOC = {
-    "id": ["id","docenteid","codigo","cod","iddocente","id_docente","num","numero","mecanografico"],
-    "nome": ["nome","docente","professor","name"],
-    "grupo": ["grupo","grupoderecrutamento","gr","codigo_grupo","grupo_codigo"],
-    "reducao79_min": ["reducao79_min","reducao79","art79","artigo79","art79min","artigo79min","min79"],
-}
-ALIASES_TUR = {
-    "id":["id","turma","cod","codigo"],
-    "ciclo":["ciclo"],
-    "ano":["ano","serie"],
-    "curso":["curso","cursosigla","curso_sigla"],
-    "n_alunos":["nalunos","alunos","n","numalunos"],
-    "escola":["escola","estabelecimento"]
-}
-ALIASES_MAT = {
-    "ciclo":["ciclo"],
-    "ano":["ano"],
-    "disciplina":["disciplina","disc","nome"],
-    "carga_sem_min":["carga_sem_min","carga","min","min_sem","minsemanais"]
-}
-ALIASES_CAR = {
-    "id":["id","codigo","cod"],
-    "cargo":["cargo","funcao","função","designacao","descricao","descrição"],
-    "carga_min":["carga_min","cargamin","carga","min","minutos"]
-}
-
-def apply_aliases(df, aliases):
-    cols = set(df.columns)
-    ren = {}
-    for canon, alts in aliases.items():
-        if canon in cols:
-            continue
-        for a in alts:
-            if a in cols:
-                ren[a] = canon
-                break
-    if ren:
-        df = df.rename(columns=ren)
-    return df
-
-def ensure(df, cols_defaults: dict, label=""):
-    for c, default in cols_defaults.items():
-        if c not in df.columns:
-            df[c] = default
-    return df
-
-def norm_ciclo(x):
-    if pd.isna(x): return ""
-    s=str(x).strip().lower()
-    if s.startswith(("pré","pre")): return "Pré"
-    if s.startswith("1"): return "1º"
-    if s.startswith("2"): return "2º"
-    if s.startswith("3"): return "3º"
-    if s.startswith(("sec","secund")): return "Sec"
-    return str(x)
-
-def norm_ano(x):
-    if pd.isna(x): return ""
-    s=str(x).strip().lower()
-    if s.startswith(("pré","pre")): return "Pré"
-    m = re.search(r"\d+", s)
-    return m.group(0) if m else str(x)
-
 # ======================================================
 # Session state
 # ======================================================
-if "assignments" not in st.session_state:
-    st.session_state.assignments = []  # turmas/disciplinas -> docente
+if "store" not in st.session_state:
+    st.session_state.store = AssignmentStore()  # turmas/disciplinas -> docente
 if "cargos_atr" not in st.session_state:
     st.session_state.cargos_atr = []   # cargos atribuídos (id,cargo,carga_min,docente_id,imputacao)
+if "cargos_ver" not in st.session_state:
+    st.session_state.cargos_ver = 0    # muda sempre que cargos_atr é substituída
 if "te_global" not in st.session_state:
     st.session_state.te_global = 150
+if "graph" not in st.session_state:
+    st.session_state.graph = Graph()
+
+# espaço de trabalho em disco: a distribuição e os cargos sobrevivem a reinícios do servidor
+ws_nome = st.sidebar.text_input("Espaço de trabalho", os.environ.get("DISTRIBUICAO_WORKSPACE", "principal"),
+                                help=f"Nome (letras, números, _ e -), gravado em {WORKSPACE_DIR}/; vazio: não gravar. "
+                                     "Cada espaço de trabalho só grava a partir de uma sessão de cada vez.").strip()
+ws_atual = st.session_state.get("ws")
+if ws_atual is not None and ws_atual.revogado:
+    # outra sessão tomou posse do ficheiro: esta deixa de gravar
+    st.sidebar.warning(f"O espaço de trabalho '{ws_atual.nome}' foi aberto noutra sessão; esta sessão deixou de o gravar.")
+    st.session_state.ws = ws_atual = None
+if ws_nome and getattr(ws_atual, "nome", None) != ws_nome:
+    # sem espaço de trabalho o estado em memória não está gravado: confirmar antes de o substituir
+    por_gravar = ws_atual is None and (len(st.session_state.store) or st.session_state.cargos_atr)
+    if por_gravar and NOME_RE.fullmatch(ws_nome) and not st.sidebar.button(f"Abrir '{ws_nome}' e substituir o estado atual"):
+        st.sidebar.warning("A distribuição e os cargos atuais não estão gravados e serão substituídos pelos do espaço de trabalho.")
+    else:
+        try:
+            novo_ws = open_workspace(ws_nome, tomar=st.session_state.pop("ws_tomar", None) == ws_nome)
+        except WorkspaceEmUso as e:
+            novo_ws = None
+            st.sidebar.error(f"{e} Se for a sua sessão anterior (ex.: página recarregada), pode tomar posse; a outra sessão deixa de gravar.")
+            if st.sidebar.button(f"Tomar posse de '{ws_nome}'"):
+                st.session_state.ws_tomar = ws_nome
+                st.rerun()
+        except ValueError as e:
+            novo_ws = None
+            st.sidebar.error(str(e))
+        if novo_ws is not None:
+            if ws_atual is not None:
+                ws_atual.close()
+            st.session_state.ws = novo_ws
+            st.session_state.store, st.session_state.cargos_atr = novo_ws.load()
+            st.session_state.cargos_ver += 1
+            novo_ws.attach(st.session_state.store)
+elif not ws_nome and ws_atual is not None:
+    ws_atual.close()
+    st.session_state.ws = None
+ws = st.session_state.get("ws")
+store = st.session_state.store
+g = st.session_state.graph
+# histórico desfazer/refazer: um por store (carregar outro espaço de trabalho recomeça-o)
+if getattr(st.session_state.get("hist"), "store", None) is not store:
+    st.session_state.hist = History(store)
+hist = st.session_state.hist
 
 def assignments_df():
-    if not st.session_state.assignments:
-        return pd.DataFrame(columns=["turma_id","ciclo","ano","disciplina","docente_id"])
-    df = pd.DataFrame(st.session_state.assignments)
-    if not df.empty:
-        df["docente_id"] = df["docente_id"].astype(str)
-    return df
+    return g.get("distribuicao")
 
 def cargos_df():
-    if not st.session_state.cargos_atr:
-        return pd.DataFrame(columns=["id","cargo","carga_min","docente_id","imputacao"])
-    df = pd.DataFrame(st.session_state.cargos_atr)
-    if not df.empty:
-        df["docente_id"] = df["docente_id"].astype(str)
-        df["imputacao"] = df["imputacao"].astype(str).str.upper()
-        df["carga_min"] = pd.to_numeric(df["carga_min"], errors="coerce").fillna(0).astype(int)
-    return df
+    return g.get("cargos_df")
 
 # ======================================================
 # Uploads + modelos + TE + modo
@@ -138,6 +95,8 @@ up_doc = st.sidebar.file_uploader("docentes.csv", type=["csv"])
 up_tur = st.sidebar.file_uploader("turmas.csv", type=["csv"])
 up_mat = st.sidebar.file_uploader("matriz.csv", type=["csv"])
 up_car = st.sidebar.file_uploader("cargos.csv", type=["csv"])
+up_reg = st.sidebar.file_uploader("regras.csv (opcional)", type=["csv"])
+up_hor = st.sidebar.file_uploader("horarios.csv (opcional)", type=["csv"])
 
 # modelos CSV
 st.sidebar.markdown("### Modelos CSV")
@@ -145,57 +104,36 @@ st.sidebar.download_button("Modelo docentes.csv", "id,nome,grupo,reducao79_min\n
 st.sidebar.download_button("Modelo turmas.csv", "id,ciclo,ano,curso,n_alunos,escola\n7A,3º,7,Reg,26,Sede\n10A,Sec,10,CH,28,Sede\n", file_name="turmas.csv")
 st.sidebar.download_button("Modelo matriz.csv", "ciclo,ano,disciplina,carga_sem_min\n3º,7,Português,150\nSec,10,Física,150\nPré,Pré,At. Let.,1500\n", file_name="matriz.csv")
 st.sidebar.download_button("Modelo cargos.csv", "id,cargo,carga_min\nC1,Diretor de Turma,45\nC2,Coord. Departamento,90\nC3,Adjunto Direção,150\n", file_name="cargos.csv")
+st.sidebar.download_button("Modelo regras.csv", "tipo,grupo,valor_min,tolerancia_min,modo,idade_min,fator\nalvo,100,1500,0,exato,,\nalvo,110,1500,0,exato,,\nalvo,*,1100,50,remanescente,,\nreducao_idade,*,100,,,50,\n", file_name="regras.csv")
 
 # TE GLOBAL
 st.sidebar.subheader("Configurações Globais")
 st.session_state.te_global = st.sidebar.slider("Trabalho de Escola (TE) — global", 0, 150, st.session_state.te_global, step=5)
 
-# Carregar/normalizar dados
-if up_doc is not None:
-    docentes = read_csv_robust(up_doc)
-else:
-    docentes = pd.DataFrame([{"id":"D1","nome":"Ana Silva","grupo":"510","reducao79_min":0},
-                             {"id":"Pre1","nome":"Carla","grupo":"100","reducao79_min":0}])
-docentes = normalize_cols(docentes)
-docentes = apply_aliases(docentes, ALIASES_DOC)
-docentes = ensure(docentes, {"id":"", "nome":"", "grupo":"", "reducao79_min":0}, "docentes")
-docentes["id"] = docentes["id"].astype(str)
-docentes["grupo"] = docentes["grupo"].astype(str)
-
-if up_tur is not None:
-    turmas = read_csv_robust(up_tur)
-else:
-    turmas = pd.DataFrame([{"id":"7A","ciclo":"3º","ano":"7","curso":"Reg","n_alunos":26,"escola":"Sede"},
-                           {"id":"10A","ciclo":"Sec","ano":"10","curso":"CH","n_alunos":28,"escola":"Sede"}])
-turmas = normalize_cols(turmas)
-turmas = apply_aliases(turmas, ALIASES_TUR)
-turmas = ensure(turmas, {"id":"", "ciclo":"", "ano":"", "curso":"", "n_alunos":0, "escola":""}, "turmas")
-turmas["ciclo"] = turmas["ciclo"].map(norm_ciclo)
-turmas["ano"] = turmas["ano"].map(norm_ano)
-turmas["id"] = turmas["id"].astype(str)
-
-if up_mat is not None:
-    matriz = read_csv_robust(up_mat)
-else:
-    matriz = pd.DataFrame([{"ciclo":"3º","ano":"7","disciplina":"Português","carga_sem_min":150},
-                           {"ciclo":"Sec","ano":"10","disciplina":"Física","carga_sem_min":150},
-                           {"ciclo":"Pré","ano":"Pré","disciplina":"At. Let.","carga_sem_min":1500}])
-matriz = normalize_cols(matriz)
-matriz = apply_aliases(matriz, ALIASES_MAT)
-matriz = ensure(matriz, {"ciclo":"", "ano":"", "disciplina":"", "carga_sem_min":0}, "matriz")
-matriz["ciclo"] = matriz["ciclo"].map(norm_ciclo)
-matriz["ano"] = matriz["ano"].map(norm_ano)
-matriz["carga_sem_min"] = pd.to_numeric(matriz["carga_sem_min"], errors="coerce").fillna(0).astype(int)
-
-if up_car is not None:
-    cargos = read_csv_robust(up_car)
+# perfil de execução (opcional): tempo, linhas e pico de memória por etapa
+perf_on = st.sidebar.toggle("Perfil de execução", value=False, key="perf_on",
+                           help="O pico de memória usa o tracemalloc, que é global ao servidor: enquanto algum perfil "
+                                "estiver ligado, todas as sessões ficam mais lentas e os picos incluem as outras sessões.")
+if perf_on:
+    if "profiler" not in st.session_state:
+        st.session_state.profiler = Profiler()
+    st.session_state.profiler.start_run()
 else:
-    cargos = pd.DataFrame([{"id":"C1","cargo":"Diretor de Turma","carga_min":45},
-                           {"id":"C2","cargo":"Coord. Departamento","carga_min":90}])
-cargos = normalize_cols(cargos)
-cargos = apply_aliases(cargos, ALIASES_CAR)
-cargos = ensure(cargos, {"id":"", "cargo":"", "carga_min":0}, "cargos")
-cargos["carga_min"] = pd.to_numeric(cargos["carga_min"], errors="coerce").fillna(0).astype(int)
+    profiling.disable(st.session_state.get("profiler"))
+
+# Carregar/normalizar dados (cache por conteúdo: reruns sem novos uploads não voltam a ler)
+def carregar(kind, up):
+    with stage(f"ingest:{kind}") as s:
+        df = load_table(kind, up)
+        s.rows = len(df)
+    return df
+
+docentes = carregar("docentes", up_doc)
+turmas = carregar("turmas", up_tur)
+matriz = carregar("matriz", up_mat)
+cargos = carregar("cargos", up_car)
+regras = carregar("regras", up_reg)
+horarios = carregar("horarios", up_hor)
 
 # ======================================================
 # Sidebar: lista de docentes e modo
@@ -204,60 +142,111 @@ st.sidebar.markdown("### Professores")
 grp_opts = ["Todos"] + sorted(docentes["grupo"].unique().tolist())
 gsel = st.sidebar.selectbox("Filtrar por grupo", options=grp_opts, index=0)
 q = st.sidebar.text_input("Pesquisa por nome/id","")
-dv = docentes.copy()
-if gsel!="Todos":
-    dv = dv[dv["grupo"]==gsel]
-if q.strip():
-    ql = q.lower()
-    dv = dv[dv.apply(lambda r: ql in str(r["nome"]).lower() or ql in str(r["id"]).lower(), axis=1)]
-for _, r in dv.iterrows():
-    st.sidebar.write(f"**{r['id']}** — {r['nome']} ({r['grupo']})")
+# índice reconstruído só quando o ficheiro de docentes muda
+with stage("pesquisa") as s:
+    if getattr(st.session_state.get("doc_idx"), "signature", None) != docentes.attrs.get("source_key"):
+        st.session_state.doc_idx = DocenteIndex(docentes, docentes.attrs.get("source_key"))
+    doc_hits = st.session_state.doc_idx.search(q, None if gsel=="Todos" else gsel)
+    s.rows = len(doc_hits)
+roster_box = st.sidebar.container()  # preenchido no fim, com letiva/semáforo já atualizados
 
 st.sidebar.markdown("---")
-modo = st.sidebar.radio("Modo de trabalho", ["Por turma","Por docente","Por disciplina/ano","Resumo","Cargos"], index=0)
+modo = st.sidebar.radio("Modo de trabalho", ["Por turma","Por docente","Por disciplina/ano","Resumo","Cargos","Auto-distribuir","Horários","Cenários"], index=0)
 
 # ======================================================
-# Helper: calcular letiva por docente a partir das atribuições + cargos LETIVA
+# Grafo de computações: cada nó é calculado só quando pedido e quando as entradas mudam
 # ======================================================
-def calc_letiva_por_docente(assign_df, matriz_df, cargos_df, docentes_df):
-    # letiva por disciplinas
-    if assign_df.empty:
-        let_disc = pd.DataFrame(columns=["docente_id","letiva_from_disc_min"])
-    else:
-        mat_key = matriz_df[["ciclo","ano","disciplina","carga_sem_min"]].drop_duplicates()
-        rep = assign_df.merge(mat_key, how="left", on=["ciclo","ano","disciplina"])
-        rep["carga_sem_min"] = pd.to_numeric(rep["carga_sem_min"], errors="coerce").fillna(0).astype(int)
-        let_disc = rep.groupby("docente_id")["carga_sem_min"].sum().reset_index().rename(columns={"carga_sem_min":"letiva_from_disc_min"})
-    # letiva por cargos LETIVA
-    if cargos_df.empty:
-        let_car = pd.DataFrame(columns=["docente_id","letiva_from_cargos_min"])
-    else:
-        let_ct = cargos_df[cargos_df["imputacao"]=="LETIVA"].groupby("docente_id")["carga_min"].sum().reset_index().rename(columns={"carga_min":"letiva_from_cargos_min"})
-        let_car = let_ct
-    # base docentes
-    base = docentes_df[["id","nome","grupo","reducao79_min"]].copy().rename(columns={"id":"docente_id"})
-    base["docente_id"]=base["docente_id"].astype(str); base["grupo"]=base["grupo"].astype(str)
-    base["reducao79_min"]=pd.to_numeric(base["reducao79_min"], errors="coerce").fillna(0).astype(int)
-    # merge
-    base = base.merge(let_disc, how="left", on="docente_id").merge(let_car, how="left", on="docente_id")
-    base["letiva_from_disc_min"]=base["letiva_from_disc_min"].fillna(0).astype(int)
-    base["letiva_from_cargos_min"]=base["letiva_from_cargos_min"].fillna(0).astype(int)
-    base["letiva_total_min"]=base["letiva_from_disc_min"]+base["letiva_from_cargos_min"]
-    return base
+for kind, df in (("docentes", docentes), ("turmas", turmas), ("matriz", matriz), ("regras", regras)):
+    g.source(kind, df, df.attrs.get("source_key"))
+g.source("store", store, id(store))
+g.source("atribuicoes", store, lambda: store.version)
+g.source("cargos_atr", st.session_state.cargos_atr, st.session_state.cargos_ver)
+g.source("te_global", st.session_state.te_global, st.session_state.te_global)
+
+def _credito(n_turmas, c):
+    return {"n_turmas": n_turmas, "credito_total": float(c[0]), "credito_gasto": float(c[1]), "credito_restante": float(c[2])}
+
+g.node("slots", ["turmas","matriz"], slot_table)
+# o ledger segue as atribuições (subscrição do store) e os cargos (set_cargos):
+# só é reconstruído quando mudam o store ou as tabelas de referência; os cargos
+# atuais entram na construção sem serem dependência
+g.node("ledger", ["store","docentes","matriz","regras"],
+       lambda s, d, m, r: build_ledger(d, m, RuleSet(r), s, g.get("cargos_atr")))
+g.node("cargas", ["ledger","atribuicoes","cargos_atr","te_global"], lambda led, _a, _c, te: led.refresh(te))
+g.node("n_turmas", ["turmas"], n_turmas_credito)   # turmas dos ciclos 1º, 2º, 3º e Sec
+g.node("credito", ["ledger","cargas","n_turmas"], lambda led, _c, n: led.credito(n))
+# o cubo de cobertura segue as atribuições pela subscrição do store
+g.node("cobertura", ["slots","store"], lambda sl, s: CoverageCube(sl).attach(s))
+g.node("distribuicao", ["atribuicoes"], lambda s: s.to_df())
+g.node("cargos_df", ["cargos_atr"], cargos_atr_df)
+g.node("export:distribuicao", ["distribuicao"], lambda d: d.to_csv(index=False).encode("utf-8"))
+g.node("export:cargos", ["cargos_df"], lambda c: c.to_csv(index=False).encode("utf-8"))
+
+def baixar(*nomes):
+    """Nós pedidos por um download (thread fora da sessão), com o store parado durante a avaliação."""
+    with g.get("store").lock:
+        return [g.get(n) for n in nomes]
+
+def zip_relatorios():
+    # o ZIP não é um nó: é gerado a cada clique (entradas vindas do grafo) e não fica em cache na sessão
+    assign, cargas, cargos_atr, n_turmas, credito = baixar("distribuicao", "cargas", "cargos_df", "n_turmas", "credito")
+    return export_zip_bytes(assign, cargas[CARGAS_COLS], cargos_atr, turmas, matriz, _credito(n_turmas, credito))
 
 # ======================================================
 # Pages
 # ======================================================
-if modo=="Por turma":
+# Cada página é um fragmento: interações locais (filtros, seleções) só voltam a
+# correr a página; alterações à distribuição/cargos pedem uma execução completa
+# (concluir) para o rodapé, o crédito e o espaço de trabalho as refletirem.
+if "flash" in st.session_state:
+    kind, msg = st.session_state.pop("flash")
+    getattr(st, kind)(msg)
+
+def concluir(msg, kind="success", acao=None):
+    # as alterações desta ação passam a ser um passo do histórico
+    hist.commit(acao or msg.rstrip("."))
+    st.session_state.flash = (kind, msg)
+    st.rerun()
+
+def guardar_cargos(records):
+    with store.lock:
+        st.session_state.cargos_atr = hist.on_cargos(st.session_state.cargos_atr, records)
+        st.session_state.cargos_ver += 1
+        g.source("cargos_atr", st.session_state.cargos_atr, st.session_state.cargos_ver)
+        g.get("ledger").set_cargos(st.session_state.cargos_atr)
+
+# ======================================================
+# Histórico (sidebar): desfazer/refazer e pontos com nome
+# ======================================================
+def historico(pos, msg):
+    n = hist.ir_para(pos, guardar_cargos)
+    concluir(f"{msg} ({n} passo(s)).", "info")
+
+with st.sidebar.expander("Histórico", expanded=False):
+    st.caption(f"Passo {hist.pos}" + (f" — {hist.passo_atual()}" if hist.pode_desfazer() else ""))
+    c1,c2 = st.columns(2)
+    if c1.button("Desfazer", disabled=not hist.pode_desfazer(), help=hist.passo_atual(), use_container_width=True):
+        historico(hist.pos - 1, "Desfeito")
+    if c2.button("Refazer", disabled=not hist.pode_refazer(), help=hist.passo_seguinte(), use_container_width=True):
+        historico(hist.pos + 1, "Refeito")
+    nome = st.text_input("Nome do ponto", key="hist_nome").strip()
+    if st.button("Marcar ponto", disabled=not nome):
+        hist.marcar(nome)
+        st.success(f"Ponto '{nome}' no passo {hist.pos}.")
+    if hist.pontos:
+        ponto = st.selectbox("Pontos", options=list(hist.pontos), format_func=lambda p: f"{p} (passo {hist.pontos[p]})", key="hist_ponto")
+        if st.button("Ir para o ponto"):
+            historico(hist.pontos[ponto], f"Reposto '{ponto}'")
+
+@st.fragment
+def pagina_por_turma():
     st.title("Distribuição — Por Turma")
     turma_sel = st.selectbox("Selecionar turma", options=list(turmas["id"]))
     trow = turmas[turmas["id"]==turma_sel].iloc[0]
     ciclo_sel, ano_sel = trow["ciclo"], trow["ano"]
     disc_list = matriz[(matriz["ciclo"]==ciclo_sel) & (matriz["ano"]==ano_sel)]["disciplina"].dropna().astype(str).tolist()
-    ass = assignments_df()
-    ass_map = ass[ass["turma_id"]==turma_sel].set_index("disciplina")["docente_id"].to_dict()
     df = pd.DataFrame({"disciplina": disc_list})
-    df["docente_id"] = df["disciplina"].map(ass_map).fillna("")
+    df["docente_id"] = store.lookup([turma_sel]*len(disc_list), disc_list)
     sel_opts = [""] + list(docentes["id"].astype(str))
     edited = st.data_editor(df, column_config={
         "docente_id": st.column_config.SelectboxColumn("Docente", options=sel_opts)
@@ -265,143 +254,226 @@ if modo=="Por turma":
     c1,c2,c3 = st.columns([1,1,2])
     with c1:
         if st.button("Guardar turma"):
-            new = assignments_df()
-            new = new[new["turma_id"]!=turma_sel]
-            lines = []
-            for _, r in edited.iterrows():
-                if str(r["docente_id"]).strip()!="":
-                    lines.append({"turma_id":turma_sel,"ciclo":ciclo_sel,"ano":ano_sel,"disciplina":r["disciplina"],"docente_id":str(r["docente_id"])})
-            if lines:
-                new = pd.concat([new, pd.DataFrame(lines)], ignore_index=True)
-            st.session_state.assignments = new.to_dict(orient="records")
-            st.success("Turma guardada.")
+            save_turma(store, turma_sel, ciclo_sel, ano_sel, edited)
+            concluir("Turma guardada.", acao=f"Guardar turma {turma_sel}")
     with c2:
         if st.button("Limpar turma"):
-            st.session_state.assignments = [r for r in st.session_state.assignments if r["turma_id"]!=turma_sel]
-            st.info("Atribuições removidas.")
+            store.remove_turma(turma_sel)
+            concluir("Atribuições removidas.", "info", acao=f"Limpar turma {turma_sel}")
     with c3:
         dest = st.selectbox("Atribuir todas as disciplinas a…", options=sel_opts, index=0)
         if st.button("Aplicar"):
             if dest!="":
-                lines = [{"turma_id":turma_sel,"ciclo":ciclo_sel,"ano":ano_sel,"disciplina":d,"docente_id":dest} for d in disc_list]
-                st.session_state.assignments = [r for r in st.session_state.assignments if r["turma_id"]!=turma_sel] + lines
-                st.success("Atribuições efetuadas.")
+                save_turma(store, turma_sel, ciclo_sel, ano_sel, df, dest)
+                concluir("Atribuições efetuadas.", acao=f"Atribuir turma {turma_sel} a {dest}")
             else:
                 st.warning("Escolha um docente.")
 
-elif modo=="Por docente":
+@st.fragment
+def pagina_por_docente():
     st.title("Distribuição — Por Docente")
     docente_sel = st.selectbox("Docente", options=list(docentes["id"].astype(str)))
-    td = turmas.merge(matriz, how="left", on=["ciclo","ano"])
-    td = td[["id","ciclo","ano","disciplina","carga_sem_min"]].dropna(subset=["disciplina"]).rename(columns={"id":"turma_id"})
-    ass = assignments_df()
-    amap = ass.set_index(["turma_id","disciplina"])["docente_id"].to_dict()
-    td["atribuido_a"] = td.apply(lambda r: amap.get((r["turma_id"], r["disciplina"]),"") ,axis=1)
+    td = g.get("slots")[["turma_id","ciclo","ano","disciplina","carga_sem_min"]]
+    td["atribuido_a"] = store.lookup(td["turma_id"], td["disciplina"])
     td["atribuir"] = td["atribuido_a"]==docente_sel
     edited = st.data_editor(td, column_config={"atribuir": st.column_config.CheckboxColumn("Atribuir")}, hide_index=True, use_container_width=True)
     if st.button("Guardar atribuições do docente"):
-        ass_new = ass.copy()
-        # remove atribuições atuais do docente se desmarcadas
-        to_keep=[]
-        for _, r in ass_new.iterrows():
-            key = (r["turma_id"], r["disciplina"])
-            m = edited[(edited["turma_id"]==r["turma_id"]) & (edited["disciplina"]==r["disciplina"])]
-            if len(m)>0 and not bool(m.iloc[0]["atribuir"]) and r["docente_id"]==docente_sel:
-                continue
-            to_keep.append(r)
-        ass_new = pd.DataFrame(to_keep) if to_keep else pd.DataFrame(columns=ass.columns)
-        # add marcadas
-        for _, r in edited.iterrows():
-            if bool(r["atribuir"]):
-                ass_new = ass_new[~((ass_new["turma_id"]==r["turma_id"]) & (ass_new["disciplina"]==r["disciplina"]))]
-                ass_new = pd.concat([ass_new, pd.DataFrame([{
-                    "turma_id": r["turma_id"], "ciclo": r["ciclo"], "ano": r["ano"],
-                    "disciplina": r["disciplina"], "docente_id": docente_sel
-                }])], ignore_index=True)
-        st.session_state.assignments = ass_new.to_dict(orient="records")
-        st.success("Atribuições guardadas.")
-
-elif modo=="Por disciplina/ano":
+        save_docente(store, docente_sel, edited)
+        concluir("Atribuições guardadas.", acao=f"Guardar docente {docente_sel}")
+
+@st.fragment
+def pagina_disciplina_ano():
     st.title("Distribuição — Por Disciplina/Ano")
     disc_sel = st.selectbox("Disciplina", options=sorted(matriz["disciplina"].unique().tolist()))
     ano_sel = st.selectbox("Ano", options=sorted(matriz["ano"].unique().tolist()))
     ciclos = ["(auto)"] + sorted(matriz.loc[matriz["disciplina"]==disc_sel, "ciclo"].unique().tolist())
     ciclo_hint = st.selectbox("Ciclo (opcional)", options=ciclos, index=0)
-    msub = matriz[(matriz["disciplina"]==disc_sel) & (matriz["ano"]==ano_sel)]
+    slots = g.get("slots")
+    m = (slots["disciplina"]==disc_sel) & (slots["ano"]==ano_sel)
     if ciclo_hint!="(auto)":
-        msub = msub[msub["ciclo"]==ciclo_hint]
-    tsub = turmas.merge(msub[["ciclo","ano","disciplina","carga_sem_min"]], how="inner", on=["ciclo","ano"]) \
-                 .rename(columns={"id":"turma_id"})[["id","ciclo","ano","disciplina","carga_sem_min"]]
-    tsub = tsub.rename(columns={"id":"turma_id"})
-    amap = assignments_df().set_index(["turma_id","disciplina"])["docente_id"].to_dict()
-    tsub["docente_id"] = tsub.apply(lambda r: amap.get((r["turma_id"], r["disciplina"]),"") ,axis=1)
+        m &= slots["ciclo"]==ciclo_hint
+    tsub = slots.loc[m, ["turma_id","ciclo","ano","disciplina","carga_sem_min"]].reset_index(drop=True)
+    tsub["docente_id"] = store.lookup(tsub["turma_id"], tsub["disciplina"])
     sel = [""] + list(docentes["id"].astype(str))
     edited = st.data_editor(tsub, column_config={"docente_id": st.column_config.SelectboxColumn("Docente", options=sel)}, hide_index=True, use_container_width=True)
+    ciclo_sel = None if ciclo_hint=="(auto)" else ciclo_hint
     c1,c2 = st.columns([1,2])
     with c1:
         if st.button("Guardar atribuições (disciplina/ano)"):
-            ass = assignments_df()
-            if ciclo_hint=="(auto)":
-                ass_new = ass[~((ass["disciplina"]==disc_sel)&(ass["ano"]==ano_sel))].copy()
-            else:
-                ass_new = ass[~((ass["disciplina"]==disc_sel)&(ass["ano"]==ano_sel)&(ass["ciclo"]==ciclo_hint))].copy()
-            for _, r in edited.iterrows():
-                did = str(r["docente_id"]).strip()
-                if did=="":
-                    continue
-                ass_new = pd.concat([ass_new, pd.DataFrame([{
-                    "turma_id": r["turma_id"], "ciclo": r["ciclo"], "ano": r["ano"],
-                    "disciplina": r["disciplina"], "docente_id": did
-                }])], ignore_index=True)
-            st.session_state.assignments = ass_new.to_dict(orient="records")
-            st.success("Guardado.")
+            save_disc_ano(store, disc_sel, ano_sel, ciclo_sel, edited)
+            concluir("Guardado.", acao=f"Guardar {disc_sel} {ano_sel}")
     with c2:
         dest = st.selectbox("Atribuir todas a…", options=sel, index=0)
         if st.button("Aplicar atribuição total"):
             if dest!="":
-                ass = assignments_df()
-                if ciclo_hint=="(auto)":
-                    ass_new = ass[~((ass["disciplina"]==disc_sel)&(ass["ano"]==ano_sel))].copy()
-                else:
-                    ass_new = ass[~((ass["disciplina"]==disc_sel)&(ass["ano"]==ano_sel)&(ass["ciclo"]==ciclo_hint))].copy()
-                novas = [{
-                    "turma_id": r["turma_id"], "ciclo": r["ciclo"], "ano": r["ano"],
-                    "disciplina": r["disciplina"], "docente_id": dest
-                } for _, r in edited.iterrows()]
-                st.session_state.assignments = (pd.concat([ass_new, pd.DataFrame(novas)], ignore_index=True)).to_dict(orient="records")
-                st.success("Aplicado.")
+                save_disc_ano(store, disc_sel, ano_sel, ciclo_sel, edited, dest)
+                concluir("Aplicado.", acao=f"Aplicar atribuição total de {disc_sel} {ano_sel} a {dest}")
             else:
                 st.warning("Escolha um docente.")
 
-elif modo=="Resumo":
-    st.title("Resumo — Badges por ano e disciplina")
-    out_df = assignments_df()
-    base = turmas.merge(matriz, how="left", on=["ciclo","ano"])[["id","ciclo","ano","disciplina"]].dropna(subset=["disciplina"]).rename(columns={"id":"turma_id"})
-    who = out_df.set_index(["turma_id","disciplina"])["docente_id"].to_dict()
-    base["atribuido_a"] = base.apply(lambda r: who.get((r["turma_id"], r["disciplina"]),"") ,axis=1)
-    base["estado"] = base["atribuido_a"].apply(lambda x: "Atribuída" if str(x).strip()!="" else "Por atribuir")
-    tab1, tab2 = st.tabs(["Por ano","Por disciplina"])
+@st.fragment
+def pagina_resumo():
+    st.title("Resumo — cobertura por escola, ciclo, ano, disciplina e curso")
+    cube = g.get("cobertura")
+    filtros = {}
+    for col, d in zip(st.columns(len(COB_DIMS)), COB_DIMS):
+        v = col.selectbox(d.capitalize(), options=["Todos"] + cube.valores(d, **filtros), key=f"cob_{d}")
+        if v != "Todos":
+            filtros[d] = v
+    tot = cube.slice((), **filtros).iloc[0]
+    c1,c2,c3,c4 = st.columns(4)
+    c1.metric("Slots", int(tot["slots"]))
+    c2.metric("Por atribuir", int(tot["por_atribuir"]))
+    c3.metric("Minutos por atribuir", int(tot["minutos_por_atribuir"]), delta=f"de {int(tot['minutos'])}", delta_color="off")
+    c4.metric("Cobertura", f"{tot['cobertura_pct']}%")
+    tab1, tab2, tab3 = st.tabs(["Por ano","Por disciplina","Explorar"])
     with tab1:
-        cts = base.groupby("ano").agg(total=("disciplina","count"), por_atribuir=("estado", lambda s: (s=="Por atribuir").sum())).reset_index()
+        cts = cube.slice(["ano"], **filtros)
         st.markdown("**Badges:** *por atribuir / total*")
         cols = st.columns(len(cts)) if len(cts)>0 else []
         for col, (_, r) in zip(cols, cts.iterrows()):
-            col.metric(label=f"Ano {r['ano']}", value=int(r['por_atribuir']), delta=f"de {int(r['total'])}")
-        ano_sel = st.selectbox("Filtrar ano", options=["Todos"]+list(cts["ano"]), index=0)
-        view = base if ano_sel=="Todos" else base[base["ano"]==ano_sel]
-        st.dataframe(view.sort_values(["ano","turma_id","disciplina"]), use_container_width=True)
+            col.metric(label=f"Ano {r['ano']}", value=int(r['por_atribuir']), delta=f"de {int(r['slots'])}")
     with tab2:
-        cts = base.groupby("disciplina").agg(total=("turma_id","count"), por_atribuir=("estado", lambda s: (s=="Por atribuir").sum())).reset_index()
+        cts = cube.slice(["disciplina"], **filtros)
         for i in range(0, len(cts), 4):
             row = cts.iloc[i:i+4]
             cols = st.columns(len(row))
             for col, (_, r) in zip(cols, row.iterrows()):
-                col.metric(label=r["disciplina"], value=int(r["por_atribuir"]), delta=f"de {int(r['total'])}")
-        disc_sel = st.selectbox("Filtrar disciplina", options=["Todos"]+list(cts["disciplina"]), index=0)
-        view = base if disc_sel=="Todos" else base[base["disciplina"]==disc_sel]
-        st.dataframe(view.sort_values(["disciplina","turma_id"]), use_container_width=True)
-
-else:  # CARGOS
+                col.metric(label=r["disciplina"], value=int(r["por_atribuir"]), delta=f"de {int(r['slots'])}")
+    with tab3:
+        by = st.multiselect("Agrupar por", options=COB_DIMS, default=["escola","ano"], key="cob_by")
+        st.dataframe(cube.slice(by, **filtros), hide_index=True, use_container_width=True)
+    if st.toggle("Mostrar os slots dos filtros", key="cob_detalhe"):
+        st.dataframe(cube.detalhe(store, **filtros), hide_index=True, use_container_width=True)
+
+@st.fragment
+def pagina_auto():
+    st.title("Distribuição automática")
+    st.caption("Atribui os slots turma/disciplina por atribuir a docentes do grupo de recrutamento (coluna grupo da matriz; "
+               "sem ela: Pré→100, 1º→110, restantes→outros grupos) até ao alvo letivo de cada docente. "
+               "As atribuições existentes ficam fixas.")
+    slots = g.get("slots")
+    abertos = slots[[k not in store for k in zip(slots["turma_id"], slots["disciplina"])]]
+    st.metric("Slots por atribuir", len(abertos))
+    budget = st.slider("Tempo máximo (s)", 5, 60, 30, step=5)
+    if st.button("Calcular proposta"):
+        docs = g.get("cargas")[["docente_id","grupo","alvo_letiva_min","letiva_total_min"]].reset_index(drop=True)
+        with st.spinner("A calcular proposta…"):
+            try:
+                st.session_state.auto_prop = auto_distribuir_async(abertos, docs, budget).result(timeout=budget+30)
+            except (BrokenProcessPool, FutureTimeout) as e:
+                reset_pool()
+                st.error("O cálculo da proposta falhou (" + ("tempo esgotado" if isinstance(e, FutureTimeout) else "o processo do solver terminou")
+                         + "). Tente de novo.")
+    if "auto_prop" in st.session_state:
+        prop, rel, res = st.session_state.auto_prop
+        c1,c2,c3 = st.columns(3)
+        c1.metric("Slots atribuídos", res["slots_atribuidos"], delta=f"de {res['slots_abertos']}")
+        c2.metric("Alvo letivo cumprido", f"{res['alvo_cumprido_pct']}%")
+        c3.metric("Tempo", f"{res['tempo_s']} s")
+        if res["tempo_esgotado"]:
+            st.warning("Tempo máximo esgotado: proposta parcial.")
+        st.subheader("Cumprimento por docente")
+        st.dataframe(rel, hide_index=True, use_container_width=True)
+        st.subheader("Atribuições propostas")
+        st.dataframe(prop, hide_index=True, use_container_width=True)
+        c1,c2 = st.columns(2)
+        with c1:
+            if st.button("Aplicar proposta"):
+                cur = store.scoped(zip(prop["turma_id"], prop["disciplina"]))
+                # atribuições feitas entretanto prevalecem sobre a proposta
+                store.apply(diff_assignments(cur, pd.concat([prop, cur], ignore_index=True)))
+                del st.session_state.auto_prop
+                concluir("Proposta aplicada.", acao="Aplicar proposta automática")
+        with c2:
+            if st.button("Descartar proposta"):
+                del st.session_state.auto_prop
+                st.info("Proposta descartada.")
+
+@st.fragment
+def pagina_horarios():
+    st.title("Horários — sobreposições e cruzamento com a distribuição")
+    for kind, msg in st.session_state.pop("hor_flash", []):
+        getattr(st, kind)(msg)
+    hkey = horarios.attrs.get("source_key")
+    if st.session_state.get("hor_key") != hkey:
+        st.session_state.hor_idx = ScheduleIndex(horarios)
+        st.session_state.hor_key = hkey
+    hidx = st.session_state.hor_idx
+    blocos = hidx.blocks_df()
+    if blocos.empty:
+        st.info("Carregue horarios.csv (docente_id, dia, inicio, fim, tipo, local, turma_id, disciplina).")
+    c1,c2 = st.columns(2)
+    c1.metric("Blocos", len(blocos))
+    c2.metric("Sobreposições", len(hidx.conflicts))
+    conf = hidx.conflicts_df()
+    if not conf.empty:
+        for side in ("a","b"):
+            b = blocos.loc[conf[f"bloco_{side}"]]
+            conf[f"docente_{side}"] = b["docente_id"].to_numpy()
+            conf[f"horas_{side}"] = [f"{fmt_hora(i)}–{fmt_hora(f)}" for i, f in zip(b["inicio_min"], b["fim_min"])]
+        st.dataframe(conf, hide_index=True, use_container_width=True)
+    st.subheader("Editar blocos de um docente")
+    doc_opts = sorted(blocos["docente_id"].unique().tolist())
+    if doc_opts:
+        hdoc = st.selectbox("Docente", options=doc_opts, key="hor_doc")
+        sub = blocos[blocos["docente_id"]==hdoc]
+        view = pd.DataFrame({"dia": sub["dia"], "inicio": sub["inicio_min"].map(fmt_hora), "fim": sub["fim_min"].map(fmt_hora),
+                             "local": sub["local"], "turma_id": sub["turma_id"], "disciplina": sub["disciplina"]}, index=sub.index)
+        edited = st.data_editor(view, use_container_width=True, key="hor_editor")
+        if st.button("Guardar blocos"):
+            # normalizados como na leitura do horarios.csv ("segunda" -> "Seg", "8h15" -> 495)
+            dias, ini, fim = map_unique(edited["dia"], norm_dia), hora_min(edited["inicio"]), hora_min(edited["fim"])
+            n = 0
+            for bid, dia, i, f, loc, tid, disc in zip(edited.index, dias, ini, fim, edited["local"], edited["turma_id"], edited["disciplina"]):
+                novo = {"dia": dia, "inicio_min": i, "fim_min": f, "local": str(loc or ""), "turma_id": str(tid or ""), "disciplina": str(disc or "")}
+                atual = hidx.blocks[bid]
+                # horas em branco/inválidas vêm como NA: comparar sem avaliar NA como booleano
+                if any(pd.isna(atual[k]) != pd.isna(v) or (pd.notna(v) and atual[k] != v) for k, v in novo.items()):
+                    hidx.update(bid, **novo)
+                    n += 1
+            msgs = [("success", f"{n} bloco(s) atualizado(s).")]
+            invalidas = int((ini.isna() | fim.isna()).sum())
+            if invalidas:
+                msgs.append(("warning", f"{invalidas} bloco(s) com hora em branco ou inválida: ficam fora da deteção de sobreposições."))
+            # métricas, sobreposições e cruzamento acima/abaixo refletem os blocos gravados
+            st.session_state.hor_flash = msgs
+            try:
+                st.rerun(scope="fragment")
+            except StreamlitInvalidLayoutContextError:
+                st.rerun()   # o clique veio de uma execução completa (sem âmbito de fragmento)
+    st.subheader("Minutos no horário vs carga atribuída")
+    st.caption("Só diferenças; 'atribuido' = a turma/disciplina está atribuída a este docente na distribuição.")
+    st.dataframe(cross_check(blocos, assignments_df(), matriz), hide_index=True, use_container_width=True)
+
+@st.fragment
+def pagina_cenarios():
+    st.title("Cenários — crédito e semáforo")
+    st.caption("Todas as combinações de TE global, fator sobre a redução Art.79 (reducao79_min) e imputações "
+               "alternativas dos cargos escolhidos; os restantes cargos ficam como estão.")
+    te_vals = st.multiselect("TE global (min)", options=list(range(0, 155, 5)), default=[st.session_state.te_global])
+    fat_txt = st.text_input("Fatores sobre a redução Art.79", "1.0, 0.5, 0")
+    atr = cargos_df()
+    atr = atr[atr["docente_id"]!=""]
+    car_sel = st.multiselect("Cargos a variar", options=list(atr["id"].astype(str).unique()),
+                             format_func=lambda i: f"{i} — {atr.loc[atr['id'].astype(str)==i, 'cargo'].iloc[0]}")
+    opcoes = {i: st.multiselect(f"Imputações de {i}", options=IMPUTACOES, default=IMPUTACOES, key=f"cen_{i}") for i in car_sel}
+    try:
+        fatores = [float(x) for x in fat_txt.replace(";", ",").split(",") if x.strip()]
+        grid = scenario_grid(te_vals, fatores, opcoes)
+    except ValueError as e:
+        grid = None
+        st.warning(str(e))
+    if grid is not None:
+        st.metric("Cenários", len(grid))
+        if st.button("Avaliar cenários"):
+            st.session_state.cenarios = sweep(g.get("cargas"), cargos_df(), g.get("ledger").rules, g.get("n_turmas"), grid)
+    if "cenarios" in st.session_state:
+        res = st.session_state.cenarios.sort_values(["credito_restante","vermelho"], ascending=[False, True])
+        st.dataframe(res, hide_index=True, use_container_width=True)
+
+@st.fragment
+def pagina_cargos():
     st.title("Gestão de Cargos")
     st.caption("Atribua cargos e escolha imputação (LETIVA / ART79 / TE).")
     base = cargos.copy()
@@ -417,77 +489,53 @@ else:  # CARGOS
     c1,c2 = st.columns(2)
     with c1:
         if st.button("Guardar cargos"):
-            st.session_state.cargos_atr = edited.to_dict(orient="records")
-            st.success("Cargos guardados.")
+            guardar_cargos(edited.to_dict(orient="records"))
+            concluir("Cargos guardados.", acao="Guardar cargos")
     with c2:
         if st.button("Limpar cargos"):
-            st.session_state.cargos_atr = []
-            st.info("Atribuições de cargos limpas.")
+            guardar_cargos([])
+            concluir("Atribuições de cargos limpas.", "info", acao="Limpar cargos")
     st.subheader("Cargos atribuídos (atual)")
     st.dataframe(cargos_df(), use_container_width=True)
 
+PAGINAS = {"Por turma": pagina_por_turma, "Por docente": pagina_por_docente, "Por disciplina/ano": pagina_disciplina_ano,
+           "Resumo": pagina_resumo, "Auto-distribuir": pagina_auto, "Horários": pagina_horarios,
+           "Cenários": pagina_cenarios, "Cargos": pagina_cargos}
+profiling.begin(f"pagina:{modo}")
+PAGINAS[modo]()
+profiling.end()
+
 # ======================================================
 # Cargas por docente + Semáforo
 # ======================================================
+
 st.markdown("---")
 st.header("Cargas por docente, regras e semáforo (inclui cargos)")
 
-assign_all = assignments_df()
-cargos_all = cargos_df()
-
-base_c = calc_letiva_por_docente(assign_all, matriz, cargos_all, docentes)
-# Art79 total = base (reducao79_min) + cargos imputados ART79
-art79_extra = cargos_all[cargos_all["imputacao"]=="ART79"].groupby("docente_id")["carga_min"].sum().reset_index().rename(columns={"carga_min":"art79_from_cargos_min"}) if not cargos_all.empty else pd.DataFrame(columns=["docente_id","art79_from_cargos_min"])
-base_c = base_c.merge(art79_extra, how="left", on="docente_id")
-base_c["art79_from_cargos_min"]=base_c["art79_from_cargos_min"].fillna(0).astype(int)
-base_c["art79_total_min"]=base_c["reducao79_min"]+base_c["art79_from_cargos_min"]
-# TE total = TE global + cargos TE
-te_extra = cargos_all[cargos_all["imputacao"]=="TE"].groupby("docente_id")["carga_min"].sum().reset_index().rename(columns={"carga_min":"te_from_cargos_min"}) if not cargos_all.empty else pd.DataFrame(columns=["docente_id","te_from_cargos_min"])
-base_c = base_c.merge(te_extra, how="left", on="docente_id")
-base_c["te_from_cargos_min"]=base_c["te_from_cargos_min"].fillna(0).astype(int)
-base_c["te_total_min"]=int(st.session_state.te_global)+base_c["te_from_cargos_min"]
-
-# Alvos letiva por grupo
-base_c["alvo_letiva_min"]=base_c["grupo"].apply(lambda g: 1500 if g in ["100","110"] else 1100)
-
-def avaliar_estado(row):
-    letiva = int(row["letiva_total_min"])
-    grupo = str(row["grupo"])
-    if letiva == 0: return "🔴","Sem componente letiva"
-    if grupo in ["100","110"]:
-        return ("🟢","Completa (1500 + TE)") if letiva==1500 else ("🟡","Em preenchimento")
-    else:
-        if letiva>1100: return "🟡", f"Acima de 1100 (+{letiva-1100})"
-        rem = 1100 - letiva
-        return ("🟢","Completa (remanescente <50 + TE)") if rem<50 else ("🟡","Em preenchimento")
-
-base_c[["semaforo","estado"]] = base_c.apply(lambda r: pd.Series(avaliar_estado(r)), axis=1)
-
-st.dataframe(
-    base_c[["docente_id","nome","grupo","letiva_total_min","alvo_letiva_min","art79_total_min","te_total_min","semaforo","estado"]]
-    .sort_values("docente_id"),
-    use_container_width=True
-)
+with stage("rodape:cargas") as s:
+    base_c = g.get("cargas")
+    st.dataframe(
+        base_c[CARGAS_COLS],
+        hide_index=True, use_container_width=True
+    )
+    s.rows = len(base_c)
+
+# lista de professores (sidebar): uma tabela virtualizada com os resultados da pesquisa
+with stage("sidebar:professores") as s:
+    hit_ids = [st.session_state.doc_idx.ids[p] for p in doc_hits]
+    roster = base_c.reindex(hit_ids)[["nome","grupo","letiva_total_min","semaforo"]]
+    roster.insert(0, "id", hit_ids)
+    roster_box.caption(f"{len(roster)} de {len(docentes)} docentes")
+    roster_box.dataframe(roster.rename(columns={"letiva_total_min":"letiva"}), hide_index=True, height=300, use_container_width=True)
+    s.rows = len(roster)
 
 # ======================================================
 # CRÉDITO (nova fórmula) + métricas na sidebar
 # ======================================================
-# nº de turmas dos ciclos 1º, 2º, 3º e Sec
-turmas_valid = turmas[turmas["ciclo"].isin(["1º","2º","3º","Sec"])]
-n_turmas = int(turmas_valid["id"].nunique())
-
-# total Art79 em "minutos equivalentes": soma por docente;
-# regra: grupos 100/110 dividem por 60; restantes dividem por 50; depois somar e multiplicar por 1 (já está em 'unidades'); depois *0.5
-# Primeiro, art79_total_min já inclui cargos imputados ART79
-g100 = base_c[base_c["grupo"].isin(["100","110"])]["art79_total_min"].sum() / 60.0
-g_others = base_c[~base_c["grupo"].isin(["100","110"])]["art79_total_min"].sum() / 50.0
-credito_total = 7 * n_turmas - 0.5 * (g100 + g_others)
-
-# Gasto: cargos imputados a LETIVA em unidades (min/60)
-credito_gasto = 0.0
-if not cargos_all.empty:
-    credito_gasto = cargos_all[cargos_all["imputacao"]=="LETIVA"]["carga_min"].sum() / 60.0
-credito_restante = credito_total - credito_gasto
+# total Art79 (já inclui cargos imputados ART79) e gasto LETIVA vêm do ledger
+with stage("credito"):
+    n_turmas = g.get("n_turmas")
+    credito_total, credito_gasto, credito_restante = g.get("credito")
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("Crédito (nova fórmula)")
@@ -499,22 +547,69 @@ st.sidebar.metric("Crédito — restante", round(credito_restante,2))
 # ======================================================
 # Export / Import
 # ======================================================
+# os ficheiros só são gerados ao clicar (data=callable); os CSV vêm dos nós export:*
+# do grafo (cliques repetidos sem alterações reutilizam os bytes), o ZIP é refeito a cada clique
 st.markdown("---")
+profiling.begin("export")
 c1,c2,c3 = st.columns(3)
 with c1:
-    dist_csv = assignments_df().to_csv(index=False).encode("utf-8")
-    st.download_button("Descarregar distribuição (CSV)", dist_csv, "distribuicao_servico.csv", "text/csv")
+    st.download_button("Descarregar distribuição (CSV)", lambda: baixar("export:distribuicao")[0],
+                       "distribuicao_servico.csv", "text/csv")
 with c2:
     up_dist = st.file_uploader("Repor distribuição (CSV)", type=["csv"], key="up_dist")
-    if up_dist is not None:
-        imp = read_csv_robust(up_dist)
-        need = {"turma_id","ciclo","ano","disciplina","docente_id"}
-        if imp is not None and need.issubset(set(normalize_cols(imp).columns)):
-            imp = normalize_cols(imp)
-            st.session_state.assignments = imp[list(need)].to_dict(orient="records")
-            st.success("Distribuição reposta.")
+    substituir = st.toggle("Substituir a distribuição atual (desligado: juntar)", value=True, key="dist_substituir")
+    # cada ficheiro é aplicado uma só vez (hash do conteúdo), enquanto estiver carregado
+    if up_dist is None:
+        st.session_state.pop("dist_import", None)
+    else:
+        data = up_dist.getvalue()
+        h = content_hash(data)
+        if st.session_state.get("dist_import", {}).get("hash") != h:
+            with stage("importar:distribuicao") as s:
+                try:
+                    validas, rejeitadas, resumo = validate_distribuicao(read_distribuicao(data), docentes, turmas, matriz)
+                    s.rows = resumo["linhas"]
+                    n = import_distribuicao(store, validas, substituir) if len(validas) else 0
+                    st.session_state.dist_import = {"hash": h, "resumo": resumo, "rejeitadas": rejeitadas}
+                except ValueError as e:
+                    st.session_state.dist_import = {"hash": h, "erro": str(e)}
+            if "erro" not in st.session_state.dist_import:
+                concluir(f"Distribuição importada: {resumo['validas']} linha(s) válida(s), {n} alteração(ões).",
+                         acao=f"Importar {up_dist.name}")
+        imp = st.session_state.dist_import
+        if "erro" in imp:
+            st.error(imp["erro"])
         else:
-            st.error("CSV inválido para distribuição.")
+            r = imp["resumo"]
+            st.caption(f"{r['linhas']} linhas: {r['validas']} válidas, {r['rejeitadas']} rejeitadas, {r['sem_docente']} sem docente.")
+            if r["rejeitadas"]:
+                st.warning(", ".join(f"{k}: {v}" for k, v in r.items() if k not in ("linhas","validas","rejeitadas","sem_docente") and v))
+                st.download_button("Linhas rejeitadas (CSV)", lambda: imp["rejeitadas"].to_csv(index=False).encode("utf-8"),
+                                   "distribuicao_rejeitadas.csv", "text/csv")
 with c3:
-    cargos_csv = cargos_df().to_csv(index=False).encode("utf-8")
-    st.download_button("Descarregar cargos atribuídos (CSV)", cargos_csv, "cargos_atribuidos.csv", "text/csv")
+    st.download_button("Descarregar cargos atribuídos (CSV)", lambda: baixar("export:cargos")[0],
+                       "cargos_atribuidos.csv", "text/csv")
+st.download_button("Descarregar relatórios (ZIP: fichas por docente e turma, semáforo, crédito)",
+                   zip_relatorios, "relatorios_servico.zip", "application/zip")
+profiling.end()
+
+# grava no espaço de trabalho só o que mudou nesta execução
+if ws is not None:
+    with stage("workspace:gravar") as s:
+        s.rows = ws.commit(modo, store, st.session_state.cargos_atr)
+
+# ======================================================
+# Perfil de execução (sidebar)
+# ======================================================
+if perf_on:
+    prof = st.session_state.profiler
+    prof.end_run(modo)
+    with st.sidebar.expander("Perfil de execução", expanded=True):
+        if profiling.n_ativos() > 1:
+            st.caption(f"{profiling.n_ativos()} sessões com perfil ligado: os picos de memória incluem as alocações das outras.")
+        st.dataframe(prof.last_df(), hide_index=True, use_container_width=True)
+        perf_hist = prof.history_df()
+        if len(perf_hist) > 1:
+            st.line_chart(perf_hist)
+        st.download_button("Perfil (JSON)", prof.to_json, "perfil.json", "application/json")
+        st.download_button("Perfil (Chrome trace)", prof.to_chrome_trace, "perfil_trace.json", "application/json")
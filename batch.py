@@ -0,0 +1,86 @@
+"""Cargas por docente e crédito de várias escolas em paralelo, sem interface.
+
+Uso: python batch.py PASTA_ESCOLAS [-o relatorios] [-j N] [--te 150]
+
+Cada subpasta de PASTA_ESCOLAS com um docentes.csv é uma escola (docentes.csv,
+turmas.csv, matriz.csv obrigatórios; cargos.csv, regras.csv, horarios.csv,
+distribuicao_servico.csv e cargos_atribuidos.csv opcionais).
+"""
+import argparse, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from engine import load_escola, processar_escola
+
+def escolas_em(raiz):
+    return sorted(os.path.join(raiz, d) for d in os.listdir(raiz)
+                  if os.path.isfile(os.path.join(raiz, d, "docentes.csv")))
+
+def processar(path, saida, te_global=150):
+    nome = os.path.basename(os.path.normpath(path))
+    t0 = time.perf_counter()
+    try:
+        cargas, resumo = processar_escola(load_escola(path), te_global)
+    except Exception as e:
+        return {"escola": nome, "erro": f"{type(e).__name__}: {e}"}
+    dest = os.path.join(saida, nome)
+    os.makedirs(dest, exist_ok=True)
+    cargas.to_csv(os.path.join(dest, "cargas_docentes.csv"), index=False)
+    with open(os.path.join(dest, "resumo.json"), "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+    return {"escola": nome, **resumo, "tempo_s": round(time.perf_counter() - t0, 3)}
+
+def consolidar(resultados, saida):
+    res = pd.DataFrame(resultados).sort_values("escola")
+    # contagens inteiras ficam inteiras mesmo com escolas falhadas (NA em vez de float)
+    inteiras = [c for c in res.columns
+                if all(isinstance(r[c], int) and not isinstance(r[c], bool) for r in resultados if c in r)
+                and any(c in r for r in resultados)]
+    res = res.astype({c: "Int64" for c in inteiras})
+    res.to_csv(os.path.join(saida, "resumo_consolidado.csv"), index=False)
+    # cargas de todas as escolas num só ficheiro, escola a escola; as colunas variam
+    # com os ficheiros opcionais de cada escola (ex.: idade): cabeçalho = união de todas
+    dest = os.path.join(saida, "cargas_consolidado.csv")
+    ok = res["erro"].isna() if "erro" in res.columns else pd.Series(True, index=res.index)
+    fich = {nome: os.path.join(saida, nome, "cargas_docentes.csv") for nome in res.loc[ok, "escola"]}
+    cols = ["escola"]
+    for path in fich.values():
+        cols += [c for c in pd.read_csv(path, nrows=0).columns if c not in cols]
+    pd.DataFrame(columns=cols).to_csv(dest, index=False)
+    for nome, path in fich.items():
+        c = pd.read_csv(path, dtype=str)
+        c.insert(0, "escola", nome)
+        c.reindex(columns=cols).to_csv(dest, mode="a", header=False, index=False)
+    return res
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cargas por docente e crédito de várias escolas em paralelo.")
+    ap.add_argument("raiz", help="pasta com uma subpasta de CSVs por escola")
+    ap.add_argument("-o", "--saida", default="relatorios", help="pasta dos relatórios (default: relatorios)")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="processos em paralelo")
+    ap.add_argument("--te", type=int, default=150, help="Trabalho de Escola global (min)")
+    args = ap.parse_args(argv)
+
+    escolas = escolas_em(args.raiz)
+    if not escolas:
+        print(f"Nenhuma escola (subpasta com docentes.csv) em {args.raiz}", file=sys.stderr)
+        return 2
+    os.makedirs(args.saida, exist_ok=True)
+    t0 = time.perf_counter()
+    resultados = []
+    if args.jobs <= 1:
+        resultados = [processar(p, args.saida, args.te) for p in escolas]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futs = [pool.submit(processar, p, args.saida, args.te) for p in escolas]
+            for f in as_completed(futs):
+                resultados.append(f.result())
+    consolidar(resultados, args.saida)
+    erros = [r for r in resultados if "erro" in r]
+    for r in erros:
+        print(f"{r['escola']}: {r['erro']}", file=sys.stderr)
+    print(f"{len(escolas) - len(erros)}/{len(escolas)} escolas em {time.perf_counter() - t0:.2f}s -> {args.saida}")
+    return 1 if erros else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""Benchmarks das computações de cada modo sobre agrupamentos sintéticos (synth.py).
+
+Uso: python bench.py [--tamanhos escola,agrupamento] [--casos ledger,resumo] [-n 5]
+                     [--baseline bench_baseline.json] [--guardar] [--tolerancia 0.3]
+
+Mede o tempo (mediana de n repetições) e o pico de memória (tracemalloc, uma
+repetição à parte) de cada caso. Com --guardar grava os resultados como
+baseline; sem ele compara com a baseline e sai com código 1 se houver regressões.
+"""
+import argparse, io, json, os, platform, statistics, sys, tempfile, time, tracemalloc
+import numpy as np
+import pandas as pd
+
+import ingest, synth
+from ingest import load_table, slot_table
+from store import AssignmentStore, diff_assignments, save_turma, save_docente, save_disc_ano
+from rules import RuleSet
+from engine import build_ledger, cargos_atr_df, n_turmas_credito, CARGAS_COLS
+from solver import auto_distribuir
+from horarios import ScheduleIndex, cross_check
+from scenarios import scenario_grid, sweep, IMPUTACOES
+from search import DocenteIndex
+from export import write_export_zip
+from workspace import Workspace
+from coverage import CoverageCube
+from importer import read_distribuicao, validate_distribuicao, import_distribuicao
+
+TAMANHOS = {
+    "escola": {"n_escolas": 1, "n_docentes": 80},
+    "medio": {"n_escolas": 5, "n_docentes": 400},
+    "agrupamento": {"n_escolas": 15, "n_docentes": 1000},
+}
+KINDS = ["docentes","turmas","matriz","cargos","horarios","distribuicao","cargos_atr"]
+RUIDO_MS = 2.0   # diferenças abaixo disto nunca contam como regressão
+
+# ======================================================
+# Dados de um tamanho: CSVs em memória + tabelas normalizadas
+# ======================================================
+class Dados:
+    def __init__(self, tamanho, seed=0, tmp=None):
+        self.tamanho, self.seed = tamanho, seed
+        self.tmp = tmp   # pasta temporária da execução (casos que gravam ficheiros)
+        self.csv = {k: df.to_csv(index=False).encode("utf-8") for k, df in synth.gerar(seed=seed, **TAMANHOS[tamanho]).items()}
+        self.t = {k: load_table(k, io.BytesIO(b)) for k, b in self.csv.items()}
+        self.t["regras"] = load_table("regras", None)
+        self.docentes, self.turmas, self.matriz = self.t["docentes"], self.t["turmas"], self.t["matriz"]
+        self.dist = self.t["distribuicao"][["turma_id","ciclo","ano","disciplina","docente_id"]].to_dict(orient="records")
+        self.cargos_atr = self.t["cargos_atr"].to_dict(orient="records")
+
+    def store(self):
+        return AssignmentStore(self.dist)
+
+    def ledger(self, store):
+        return build_ledger(self.docentes, self.matriz, RuleSet(self.t["regras"]), store, self.cargos_atr)
+
+# ======================================================
+# Casos: cada um recebe Dados e devolve a função a medir (preparação fora do tempo)
+# ======================================================
+CASOS = {}
+
+def caso(nome):
+    def reg(fn):
+        CASOS[nome] = fn
+        return fn
+    return reg
+
+@caso("ingest")
+def _ingest(d):
+    ingest._CACHE.clear()
+    def run():
+        for k in KINDS:
+            load_table(k, io.BytesIO(d.csv[k]))
+    return run
+
+@caso("ledger")
+def _ledger(d):
+    store = d.store()
+    return lambda: d.ledger(store).refresh(150)
+
+@caso("por_turma")
+def _por_turma(d):
+    store = d.store(); led = d.ledger(store); led.refresh(150)
+    tid = d.turmas["id"].iat[len(d.turmas) // 2]
+    did = d.docentes["id"].iat[0]
+    def run():
+        slots = slot_table(d.turmas, d.matriz)
+        df = slots[slots["turma_id"]==tid][["turma_id","ciclo","ano","disciplina"]]
+        df["docente_id"] = store.lookup(df["turma_id"], df["disciplina"])
+        save_turma(store, tid, df["ciclo"].iat[0], df["ano"].iat[0], df[["disciplina","docente_id"]], did)
+        led.refresh(150)
+    return run
+
+@caso("por_docente")
+def _por_docente(d):
+    store = d.store(); led = d.ledger(store); led.refresh(150)
+    sel = d.t["distribuicao"]["docente_id"].iat[0]
+    def run():
+        td = slot_table(d.turmas, d.matriz)[["turma_id","ciclo","ano","disciplina","carga_sem_min"]]
+        td["atribuido_a"] = store.lookup(td["turma_id"], td["disciplina"])
+        td["atribuir"] = td["atribuido_a"]==sel
+        td.loc[td.index[:5], "atribuir"] = ~td.loc[td.index[:5], "atribuir"]
+        save_docente(store, sel, td)
+        led.refresh(150)
+    return run
+
+@caso("por_disciplina_ano")
+def _por_disciplina_ano(d):
+    store = d.store(); led = d.ledger(store); led.refresh(150)
+    disc, ano = "Português", "7"
+    did = d.docentes["id"].iat[1]
+    def run():
+        slots = slot_table(d.turmas, d.matriz)
+        tsub = slots.loc[(slots["disciplina"]==disc) & (slots["ano"]==ano), ["turma_id","ciclo","ano","disciplina","carga_sem_min"]]
+        tsub["docente_id"] = store.lookup(tsub["turma_id"], tsub["disciplina"])
+        save_disc_ano(store, disc, ano, None, tsub, did)
+        led.refresh(150)
+    return run
+
+@caso("resumo")
+def _resumo(d):
+    store = d.store()
+    cube = CoverageCube(slot_table(d.turmas, d.matriz)).attach(store)
+    keys = list(store.docente)[:50]
+    def run():
+        # página Resumo: atribuições mudam (atualização incremental) e cortes do cubo
+        for k in keys:
+            store.delete(*k)
+        store.apply(diff_assignments(store.scoped(()), pd.DataFrame(d.dist[:50])))
+        cube.slice(())
+        cube.slice(["ano"])
+        cube.slice(["disciplina"])
+        cube.slice(["escola","ano"], ciclo="3º")
+    return run
+
+@caso("cargos")
+def _cargos(d):
+    store = d.store(); led = d.ledger(store); led.refresh(150)
+    rodados = [dict(r, imputacao=IMPUTACOES[(IMPUTACOES.index(r["imputacao"]) + 1) % 3]) for r in d.cargos_atr]
+    def run():
+        led.set_cargos(rodados)
+        led.refresh(150)
+    return run
+
+@caso("auto_distribuir")
+def _auto(d):
+    store = d.store(); led = d.ledger(store)
+    slots = slot_table(d.turmas, d.matriz)
+    abertos = slots[[k not in store for k in zip(slots["turma_id"], slots["disciplina"])]]
+    docs = led.refresh(150)[["docente_id","grupo","alvo_letiva_min","letiva_total_min"]].reset_index(drop=True)
+    return lambda: auto_distribuir(abertos, docs, 30)
+
+@caso("horarios")
+def _horarios(d):
+    hor, assign = d.t["horarios"], d.store().to_df()
+    def run():
+        idx = ScheduleIndex(hor)
+        idx.conflicts_df()
+        cross_check(idx.blocks_df(), assign, d.matriz)
+    return run
+
+@caso("cenarios")
+def _cenarios(d):
+    store = d.store(); led = d.ledger(store)
+    table, cargos = led.refresh(150), cargos_atr_df(d.cargos_atr)
+    ids = list(cargos["id"].astype(str).unique()[:6])
+    grid = scenario_grid([0, 75, 150], [1.0, 0.5], {i: IMPUTACOES for i in ids})
+    return lambda: sweep(table, cargos, led.rules, n_turmas_credito(d.turmas), grid)
+
+@caso("rodape_credito")
+def _rodape(d):
+    store = d.store()
+    led = d.ledger(store)   # todos os docentes por avaliar, como numa sessão nova
+    idx = DocenteIndex(d.docentes)
+    def run():
+        base = led.refresh(150)
+        base[CARGAS_COLS]
+        led.credito(n_turmas_credito(d.turmas))
+        hits = idx.search("")
+        base.reindex([idx.ids[p] for p in hits])
+    return run
+
+@caso("pesquisa")
+def _pesquisa(d):
+    def run():
+        idx = DocenteIndex(d.docentes)
+        for q in ["ana", "conceicao", "D00", "gon", "silva santos"]:
+            idx.search(q)
+    return run
+
+@caso("export")
+def _export(d):
+    store = d.store(); led = d.ledger(store)
+    cargas, assign, cargos = led.refresh(150)[CARGAS_COLS], store.to_df(), cargos_atr_df(d.cargos_atr)
+    credito = dict(zip(["credito_total","credito_gasto","credito_restante"], led.credito(n_turmas_credito(d.turmas))))
+    return lambda: write_export_zip(io.BytesIO(), assign, cargas, cargos, d.turmas, d.matriz, credito)
+
+@caso("importar")
+def _importar(d):
+    def run():
+        validas, _, _ = validate_distribuicao(read_distribuicao(d.csv["distribuicao"]), d.docentes, d.turmas, d.matriz)
+        import_distribuicao(AssignmentStore(), validas)
+    return run
+
+@caso("workspace")
+def _workspace(d):
+    # um ficheiro por tamanho, gravado uma vez, na pasta temporária da execução
+    path = os.path.join(d.tmp, f"{d.tamanho}-{d.seed}.sqlite")
+    if not os.path.exists(path):
+        ws = Workspace(path); store, _ = ws.load(); ws.attach(store)
+        for r in d.dist:
+            store.upsert(r["turma_id"], r["ciclo"], r["ano"], r["disciplina"], r["docente_id"])
+        ws.commit("bench", store, d.cargos_atr)
+        ws.close()
+    def run():
+        w = Workspace(path)
+        w.load()
+        w.close()
+    return run
+
+# ======================================================
+# Medição, baseline e regressões
+# ======================================================
+def medir(fn_setup, d, n):
+    fn_setup(d)()   # aquecimento (caches, imports tardios)
+    tempos = []
+    for _ in range(n):
+        run = fn_setup(d)
+        t0 = time.perf_counter()
+        run()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    run = fn_setup(d)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    run()
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return {"ms": round(statistics.median(tempos), 3), "ms_min": round(min(tempos), 3), "pico_kb": round(pico / 1024, 1)}
+
+def meta():
+    return {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "maquina": platform.machine(), "cpus": os.cpu_count()}
+
+def comparar(res, baseline, tol):
+    linhas = []
+    for key, r in res.items():
+        b = baseline.get("resultados", {}).get(key)
+        reg = []
+        if b:
+            if r["ms"] > b["ms"] * (1 + tol) and r["ms"] - b["ms"] > RUIDO_MS:
+                reg.append("tempo")
+            if r["pico_kb"] > b["pico_kb"] * (1 + tol) and r["pico_kb"] - b["pico_kb"] > 64:
+                reg.append("memoria")
+        linhas.append({"caso": key, **r, "base_ms": b and b["ms"], "base_pico_kb": b and b["pico_kb"],
+                       "ratio_ms": b and round(r["ms"] / max(b["ms"], 1e-9), 2), "regressao": ",".join(reg)})
+    return pd.DataFrame(linhas)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks por modo sobre agrupamentos sintéticos.")
+    ap.add_argument("--tamanhos", default="escola,agrupamento", help=f"de {','.join(TAMANHOS)}")
+    ap.add_argument("--casos", default=",".join(CASOS), help="casos a correr (default: todos)")
+    ap.add_argument("-n", "--repeticoes", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--baseline", default="bench_baseline.json")
+    ap.add_argument("--guardar", action="store_true", help="grava os resultados como nova baseline")
+    ap.add_argument("--tolerancia", type=float, default=0.3, help="aumento relativo tolerado (default 0.3)")
+    args = ap.parse_args(argv)
+
+    res = {}
+    # uma pasta temporária por execução, apagada no fim
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        for tamanho in args.tamanhos.split(","):
+            d = Dados(tamanho, args.seed, tmp)
+            for nome in args.casos.split(","):
+                res[f"{tamanho}/{nome}"] = medir(CASOS[nome], d, args.repeticoes)
+                print(f"{tamanho}/{nome}: {res[f'{tamanho}/{nome}']['ms']} ms", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta") != meta():
+            print(f"Aviso: baseline medida noutro ambiente ({baseline.get('meta')})", file=sys.stderr)
+    tab = comparar(res, baseline, args.tolerancia)
+    print(tab.to_string(index=False))
+    if args.guardar:
+        baseline = {"meta": meta(), "seed": args.seed, "resultados": {**baseline.get("resultados", {}), **res}}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=1)
+        print(f"Baseline gravada em {args.baseline}")
+        return 0
+    n_reg = int((tab["regressao"]!="").sum())
+    if n_reg:
+        print(f"{n_reg} regressão(ões) acima de {args.tolerancia:.0%}", file=sys.stderr)
+    return 1 if n_reg else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
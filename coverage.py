@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# Cubo de cobertura (escola x ciclo x ano x disciplina x curso)
+# ======================================================
+DIMS = ["escola","ciclo","ano","disciplina","curso"]
+MEDIDAS = ["slots","por_atribuir","minutos","minutos_por_atribuir"]
+
+class CoverageCube:
+    """Slots e minutos, totais e por atribuir, por célula das dimensões DIMS.
+
+    Construído uma vez a partir da tabela de slots; as atribuições chegam pela
+    subscrição do AssignmentStore e só mexem nas células do slot alterado.
+    Agregações (slice) e filtros trabalham sobre as células, nunca sobre os slots.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots.reset_index(drop=True)
+        dims = pd.DataFrame({d: self.slots[d].astype(object).fillna("").astype(str) if d in self.slots.columns else ""
+                             for d in DIMS}, index=self.slots.index)
+        grp = dims.groupby(DIMS, sort=True)
+        self.cell = grp.ngroup().to_numpy()
+        self.cells = grp.size().reset_index()[DIMS]
+        # códigos por dimensão (rótulos ordenados): cortes e agregações em numpy sobre as células
+        self.codes, self.labels = {}, {}
+        for d in DIMS:
+            self.codes[d], u = pd.factorize(self.cells[d], sort=True)
+            self.labels[d] = np.asarray(u, dtype=object)
+        self.carga = self.slots["carga_sem_min"].to_numpy(dtype=np.int64)
+        k = len(self.cells)
+        self.n_total = np.bincount(self.cell, minlength=k)
+        self.min_total = np.bincount(self.cell, weights=self.carga, minlength=k).astype(np.int64)
+        self.n_atr = np.zeros(k, dtype=np.int64)
+        self.min_atr = np.zeros(k, dtype=np.int64)
+        self.pos = {}   # (turma_id, disciplina) -> posições na tabela de slots
+        for i, key in enumerate(zip(self.slots["turma_id"].tolist(), self.slots["disciplina"].astype(str).tolist())):
+            self.pos.setdefault(key, []).append(i)
+
+    def attach(self, store):
+        atr = np.array([key in store for key in zip(self.slots["turma_id"].tolist(), self.slots["disciplina"].astype(str).tolist())], dtype=bool)
+        k = len(self.cells)
+        self.n_atr = np.bincount(self.cell[atr], minlength=k)
+        self.min_atr = np.bincount(self.cell[atr], weights=self.carga[atr], minlength=k).astype(np.int64)
+        store.subscribe("cobertura", self.on_assignment)
+        return self
+
+    def on_assignment(self, key, old, new):
+        if (old is None) == (new is None):
+            return   # troca de docente: a cobertura não muda
+        sign = 1 if new is not None else -1
+        for i in self.pos.get(key, ()):
+            c = self.cell[i]
+            self.n_atr[c] += sign
+            self.min_atr[c] += sign * self.carga[i]
+
+    def _mask(self, filtros):
+        m = np.ones(len(self.cells), dtype=bool)
+        for d, v in filtros.items():
+            lab = self.labels[d]
+            i = np.searchsorted(lab, str(v))
+            if i == len(lab) or lab[i] != str(v):
+                return np.zeros(len(self.cells), dtype=bool)
+            m &= self.codes[d] == i
+        return m
+
+    def _medidas(self, m):
+        return {"slots": self.n_total[m], "por_atribuir": self.n_total[m] - self.n_atr[m],
+                "minutos": self.min_total[m], "minutos_por_atribuir": self.min_total[m] - self.min_atr[m]}
+
+    def frame(self, **filtros):
+        """Células (com filtros por dimensão=valor) e as medidas."""
+        m = self._mask(filtros)
+        return self.cells[m].assign(**self._medidas(m))
+
+    def slice(self, by=(), **filtros):
+        """Agregado por `by` (lista de dimensões; vazia = total) das células que passam os filtros."""
+        m = self._mask(filtros)
+        med = self._medidas(m)
+        by = list(by)
+        if by:
+            shape = [len(self.labels[d]) for d in by]
+            uniq, inv = np.unique(np.ravel_multi_index([self.codes[d][m] for d in by], shape), return_inverse=True)
+            out = {d: self.labels[d][c] for d, c in zip(by, np.unravel_index(uniq, shape))}
+            out.update({n: np.bincount(inv, weights=v, minlength=len(uniq)).astype(np.int64) for n, v in med.items()})
+        else:
+            out = {n: np.array([v.sum()], dtype=np.int64) for n, v in med.items()}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = np.where(out["slots"] > 0, 100 * (1 - out["por_atribuir"] / out["slots"]), 100.0)
+        out["cobertura_pct"] = pct.round(1)
+        return pd.DataFrame(out)
+
+    def valores(self, dim, **filtros):
+        return self.labels[dim][np.unique(self.codes[dim][self._mask(filtros)])].tolist()
+
+    def detalhe(self, store, **filtros):
+        """Slots das células que passam os filtros, com o docente atribuído."""
+        sel = np.flatnonzero(self._mask(filtros))
+        s = self.slots.iloc[np.flatnonzero(np.isin(self.cell, sel))]
+        s = s[[c for c in ["turma_id"] + DIMS + ["carga_sem_min"] if c in s.columns]].copy()
+        s["atribuido_a"] = store.lookup(s["turma_id"], s["disciplina"])
+        s["estado"] = np.where(s["atribuido_a"]!="", "Atribuída", "Por atribuir")
+        return s
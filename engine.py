@@ -0,0 +1,131 @@
+import os
+import pandas as pd
+
+from ingest import load_table, empty_table, slot_table, conform
+from rules import RuleSet
+from ledger import WorkloadLedger, credito_formula, GRUPOS_PRE
+
+# ======================================================
+# Núcleo de cálculo sem Streamlit (app, processamento em lote, scripts)
+# ======================================================
+CICLOS_CREDITO = ["1º","2º","3º","Sec"]
+CARGAS_COLS = ["docente_id","nome","grupo","letiva_total_min","alvo_letiva_min","art79_total_min","te_total_min","semaforo","estado"]
+
+def cargos_atr_df(records):
+    if not len(records):
+        return pd.DataFrame(columns=["id","cargo","carga_min","docente_id","imputacao"])
+    df = pd.DataFrame(records)
+    df["docente_id"] = df["docente_id"].fillna("").astype(str)
+    df["imputacao"] = df["imputacao"].astype(str).str.upper()
+    df["carga_min"] = pd.to_numeric(df["carga_min"], errors="coerce").fillna(0).astype(int)
+    return df
+
+# ======================================================
+# Helper: calcular letiva por docente a partir das atribuições + cargos LETIVA
+# (recálculo completo; a app usa o WorkloadLedger incremental)
+# ======================================================
+def calc_letiva_por_docente(assign_df, matriz_df, cargos_df, docentes_df):
+    # letiva por disciplinas
+    if assign_df.empty:
+        let_disc = pd.DataFrame(columns=["docente_id","letiva_from_disc_min"])
+    else:
+        mat_key = matriz_df[["ciclo","ano","disciplina","carga_sem_min"]].drop_duplicates()
+        assign_df, mat_key = conform(assign_df, mat_key)
+        rep = assign_df.merge(mat_key, how="left", on=["ciclo","ano","disciplina"])
+        rep["carga_sem_min"] = pd.to_numeric(rep["carga_sem_min"], errors="coerce").fillna(0).astype(int)
+        let_disc = rep.groupby("docente_id")["carga_sem_min"].sum().reset_index().rename(columns={"carga_sem_min":"letiva_from_disc_min"})
+    # letiva por cargos LETIVA
+    if cargos_df.empty:
+        let_car = pd.DataFrame(columns=["docente_id","letiva_from_cargos_min"])
+    else:
+        let_ct = cargos_df[cargos_df["imputacao"]=="LETIVA"].groupby("docente_id")["carga_min"].sum().reset_index().rename(columns={"carga_min":"letiva_from_cargos_min"})
+        let_car = let_ct
+    # base docentes
+    cols = ["id","nome","grupo","reducao79_min"] + (["idade"] if "idade" in docentes_df.columns else [])
+    base = docentes_df[cols].copy().rename(columns={"id":"docente_id"})
+    base["docente_id"]=base["docente_id"].astype(str); base["grupo"]=base["grupo"].astype(str)
+    base["reducao79_min"]=pd.to_numeric(base["reducao79_min"], errors="coerce").fillna(0).astype(int)
+    # merge
+    base = base.merge(let_disc, how="left", on="docente_id").merge(let_car, how="left", on="docente_id")
+    base["letiva_from_disc_min"]=base["letiva_from_disc_min"].fillna(0).astype(int)
+    base["letiva_from_cargos_min"]=base["letiva_from_cargos_min"].fillna(0).astype(int)
+    base["letiva_total_min"]=base["letiva_from_disc_min"]+base["letiva_from_cargos_min"]
+    return base
+
+def _soma_cargos(cargos_df, imputacao, col):
+    if cargos_df.empty:
+        return pd.DataFrame(columns=["docente_id", col])
+    return cargos_df[cargos_df["imputacao"]==imputacao].groupby("docente_id")["carga_min"].sum().reset_index().rename(columns={"carga_min":col})
+
+def calc_cargas(assign_df, matriz_df, cargos_df, docentes_df, rules, te_global=150):
+    """Tabela completa de cargas por docente (mesmas colunas do WorkloadLedger), vetorizada."""
+    base = calc_letiva_por_docente(assign_df, matriz_df, cargos_df, docentes_df)
+    # Art79 total = base (reducao79_min) + cargos imputados ART79
+    base = base.merge(_soma_cargos(cargos_df, "ART79", "art79_from_cargos_min"), how="left", on="docente_id")
+    base["art79_from_cargos_min"]=base["art79_from_cargos_min"].fillna(0).astype(int)
+    base["art79_total_min"]=base["reducao79_min"]+base["art79_from_cargos_min"]
+    # TE total = TE global + cargos TE
+    base = base.merge(_soma_cargos(cargos_df, "TE", "te_from_cargos_min"), how="left", on="docente_id")
+    base["te_from_cargos_min"]=base["te_from_cargos_min"].fillna(0).astype(int)
+    base["te_total_min"]=int(te_global)+base["te_from_cargos_min"]
+    return base.join(rules.evaluate(base))
+
+def n_turmas_credito(turmas):
+    # nº de turmas dos ciclos 1º, 2º, 3º e Sec
+    return int(turmas.loc[turmas["ciclo"].isin(CICLOS_CREDITO), "id"].nunique())
+
+def calc_credito(cargas, cargos_df, turmas):
+    pre = cargas["grupo"].isin(GRUPOS_PRE)
+    letiva = cargos_df.loc[cargos_df["imputacao"]=="LETIVA", "carga_min"].sum() if not cargos_df.empty else 0
+    total, gasto, restante = credito_formula(n_turmas_credito(turmas), cargas.loc[pre, "art79_total_min"].sum(),
+                                             cargas.loc[~pre, "art79_total_min"].sum(), letiva)
+    return {"n_turmas": n_turmas_credito(turmas), "credito_total": float(total),
+            "credito_gasto": float(gasto), "credito_restante": float(restante)}
+
+def build_ledger(docentes, matriz, rules, store, cargos_atr=(), signature=None):
+    ledger = WorkloadLedger(docentes, matriz, rules, signature)
+    ledger.attach(store)
+    ledger.set_cargos(cargos_atr)
+    return ledger
+
+# ======================================================
+# Escola a partir de uma pasta de CSVs
+# ======================================================
+FICHEIROS = {
+    "docentes": "docentes.csv", "turmas": "turmas.csv", "matriz": "matriz.csv", "cargos": "cargos.csv",
+    "regras": "regras.csv", "horarios": "horarios.csv",
+    "distribuicao": "distribuicao_servico.csv", "cargos_atr": "cargos_atribuidos.csv",
+}
+OBRIGATORIOS = ["docentes", "turmas", "matriz"]
+
+def load_escola(path):
+    """Tabelas normalizadas de uma escola; ficheiros opcionais em falta ficam com os valores por omissão."""
+    escola = {}
+    for kind, fname in FICHEIROS.items():
+        fpath = os.path.join(path, fname)
+        if os.path.exists(fpath):
+            escola[kind] = load_table(kind, fpath)
+        elif kind in OBRIGATORIOS:
+            raise FileNotFoundError(fpath)
+        else:
+            escola[kind] = load_table(kind, None) if kind == "regras" else empty_table(kind)
+    return escola
+
+def processar_escola(escola, te_global=150):
+    """Cargas por docente + resumo (crédito, semáforo, cobertura) de uma escola já carregada."""
+    rules = RuleSet(escola["regras"])
+    dist = escola["distribuicao"][["turma_id","ciclo","ano","disciplina","docente_id"]]
+    dist = dist[dist["docente_id"]!=""].drop_duplicates(["turma_id","disciplina"], keep="last")
+    cargos_atr = escola["cargos_atr"]
+    cargas = calc_cargas(dist, escola["matriz"], cargos_atr, escola["docentes"], rules, te_global)
+    resumo = calc_credito(cargas, cargos_atr, escola["turmas"])
+    slots = slot_table(escola["turmas"], escola["matriz"])
+    resumo.update({
+        "n_docentes": int(len(cargas)),
+        "slots_total": int(len(slots)),
+        "slots_atribuidos": len(set(zip(slots["turma_id"], slots["disciplina"])) & set(zip(dist["turma_id"], dist["disciplina"]))),
+        "semaforo_verde": int((cargas["semaforo"]=="🟢").sum()),
+        "semaforo_amarelo": int((cargas["semaforo"]=="🟡").sum()),
+        "semaforo_vermelho": int((cargas["semaforo"]=="🔴").sum()),
+    })
+    return cargas, resumo
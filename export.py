@@ -0,0 +1,93 @@
+import csv, io, re, tempfile, zipfile
+from collections import defaultdict
+
+from ingest import slot_table, conform
+from engine import CARGAS_COLS
+
+# ======================================================
+# Arquivo ZIP de relatórios (fichas por docente e por turma, semáforo, crédito)
+# ======================================================
+FICHA_DOC_COLS = ["tipo","descricao","turma_id","ciclo","ano","imputacao","carga_min"]
+FICHA_TUR_COLS = ["disciplina","carga_sem_min","docente_id","nome"]
+SPOOL_MAX = 8 * 1024 * 1024
+
+def _safe(name):
+    return re.sub(r"[^\w.-]+", "_", str(name)) or "_"
+
+def _membro(usados, pasta, nome):
+    """Nome de membro único em `pasta`: ids distintos que _safe junta (ou que só diferem em maiúsculas) levam sufixo ~2, ~3..."""
+    base = _safe(nome)
+    cand, n = base, 1
+    while cand.lower() in usados:
+        n += 1
+        cand = f"{base}~{n}"
+    usados.add(cand.lower())
+    return f"{pasta}/{cand}.csv"
+
+def _write_rows(zf, name, header, rows):
+    # cada membro é escrito e comprimido à medida que as linhas são geradas
+    with zf.open(name, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+
+def _frame_rows(df):
+    return df.itertuples(index=False, name=None)
+
+def write_export_zip(fileobj, assignments, cargas, cargos_atr, turmas, matriz, credito):
+    """Escreve o arquivo de fim de período em `fileobj`, membro a membro.
+
+    `cargas`: tabela por docente (ledger/calc_cargas); `credito`: dict de métricas.
+    Linhas de docentes que não estão em `cargas` vão para sem_ficha.csv.
+    """
+    mat = matriz[["ciclo","ano","disciplina","carga_sem_min"]].drop_duplicates(["ciclo","ano","disciplina"])
+    assignments, mat = conform(assignments, mat)
+    rep = assignments.merge(mat, how="left", on=["ciclo","ano","disciplina"])
+    rep["carga_sem_min"] = rep["carga_sem_min"].fillna(0).astype(int)
+    por_doc = defaultdict(list)
+    for did, *r in zip(rep["docente_id"], rep["disciplina"], rep["turma_id"], rep["ciclo"], rep["ano"], rep["carga_sem_min"]):
+        por_doc[did].append(("Letiva", r[0], r[1], r[2], r[3], "LETIVA", int(r[4])))
+    for did, cargo, imp, carga in zip(cargos_atr["docente_id"], cargos_atr["cargo"], cargos_atr["imputacao"], cargos_atr["carga_min"]):
+        por_doc[did].append(("Cargo", cargo, "", "", "", imp, int(carga)))
+    nomes = dict(zip(cargas["docente_id"], cargas["nome"]))
+
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zf:
+        _write_rows(zf, "semaforo.csv", CARGAS_COLS, _frame_rows(cargas[CARGAS_COLS]))
+        _write_rows(zf, "credito.csv", ["metrica","valor"], credito.items())
+
+        usados = set()
+        for row in cargas.itertuples(index=False):
+            did = row.docente_id
+            linhas = por_doc.pop(did, []) + [
+                ("Resumo", "Letiva total", "", "", "", "", int(row.letiva_total_min)),
+                ("Resumo", "Alvo letivo", "", "", "", "", int(row.alvo_letiva_min)),
+                ("Resumo", "Art.79 total", "", "", "", "", int(row.art79_total_min)),
+                ("Resumo", "TE total", "", "", "", "", int(row.te_total_min)),
+                ("Resumo", f"{row.semaforo} {row.estado}", "", "", "", "", ""),
+            ]
+            _write_rows(zf, _membro(usados, "docentes", did), FICHA_DOC_COLS, linhas)
+        if por_doc:
+            _write_rows(zf, "sem_ficha.csv", ["docente_id"] + FICHA_DOC_COLS,
+                        ((did, *r) for did in sorted(por_doc, key=str) for r in por_doc[did]))
+
+        slots = slot_table(turmas, matriz)
+        quem = dict(zip(zip(assignments["turma_id"], assignments["disciplina"]), assignments["docente_id"]))
+        por_tur = defaultdict(list)
+        for tid, disc, carga in zip(slots["turma_id"], slots["disciplina"], slots["carga_sem_min"]):
+            did = quem.get((tid, disc), "")
+            por_tur[tid].append((disc, int(carga), did, nomes.get(did, "")))
+        usados = set()
+        for tid in sorted(por_tur):
+            _write_rows(zf, _membro(usados, "turmas", tid), FICHA_TUR_COLS, por_tur.pop(tid))
+
+def export_zip_file(*args):
+    """Gera o ZIP num ficheiro temporário (em disco acima de SPOOL_MAX) e devolve-o posicionado no início."""
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    write_export_zip(f, *args)
+    f.seek(0)
+    return f
+
+def export_zip_bytes(*args):
+    """Bytes do ZIP para entregar ao download no momento do clique; o ficheiro temporário é fechado logo a seguir."""
+    with export_zip_file(*args) as f:
+        return f.read()
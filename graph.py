@@ -0,0 +1,68 @@
+import threading
+
+from profiling import stage
+
+# ======================================================
+# Grafo de dependências preguiçoso (nós com nome)
+# ======================================================
+class Graph:
+    """Computações da app como nós com nome, avaliados só quando pedidos.
+
+    Fontes (`source`) recebem o valor e uma assinatura (hash do CSV, versão do
+    AssignmentStore, ...; pode ser uma função, lida no momento do get). Um nó
+    derivado (`node`) guarda o último valor e a assinatura das fontes de que
+    depende (transitivamente): enquanto nenhuma mudar, get() devolve o valor
+    guardado sem calcular nada. As funções dos nós não devem ler estado fora
+    das dependências declaradas.
+    """
+
+    def __init__(self):
+        self.sources = {}   # nome -> (valor, assinatura)
+        self.nodes = {}     # nome -> (dependências, função)
+        self.cache = {}     # nome -> (assinatura, valor)
+        self.computed = {}  # nome -> nº de cálculos (diagnóstico)
+        # os downloads (data=callable) pedem nós fora da thread da sessão
+        self.lock = threading.RLock()
+
+    def source(self, name, value, signature):
+        with self.lock:
+            self.sources[name] = (value, signature)
+
+    def node(self, name, deps, fn):
+        """Declara (ou redeclara a cada execução) um nó; o valor guardado mantém-se se as dependências forem as mesmas."""
+        with self.lock:
+            old = self.nodes.get(name)
+            if old is not None and old[0] != tuple(deps):
+                self.cache.pop(name, None)
+            self.nodes[name] = (tuple(deps), fn)
+
+    def signature(self, name):
+        with self.lock:
+            if name in self.sources:
+                sig = self.sources[name][1]
+                return sig() if callable(sig) else sig
+            return tuple(self.signature(d) for d in self.nodes[name][0])
+
+    def get(self, name):
+        with self.lock:
+            if name in self.sources:
+                return self.sources[name][0]
+            deps, fn = self.nodes[name]
+            sig = self.signature(name)
+            hit = self.cache.get(name)
+            if hit is not None and hit[0] == sig:
+                return hit[1]
+            args = [self.get(d) for d in deps]
+            with stage(f"no:{name}") as s:
+                value = fn(*args)
+                if hasattr(value, "shape"):
+                    s.rows = len(value)
+            self.cache[name] = (sig, value)
+            self.computed[name] = self.computed.get(name, 0) + 1
+            return value
+
+    def fresh(self, name):
+        """True se get(name) não precisa de calcular."""
+        with self.lock:
+            hit = self.cache.get(name)
+            return hit is not None and hit[0] == self.signature(name)
@@ -0,0 +1,132 @@
+from collections import namedtuple
+from contextlib import contextmanager
+
+# ======================================================
+# Histórico desfazer/refazer (deltas reversíveis + pontos com nome)
+# ======================================================
+# deltas: ((turma_id, disciplina), antes, depois) com antes/depois como nas
+# notificações do AssignmentStore; cargos: (lista antes, lista depois) ou None
+Passo = namedtuple("Passo", ["acao", "deltas", "cargos"])
+
+def _cargo_key(r, i):
+    return str(r.get("id") or f"#{i}")
+
+class History:
+    """Passos reversíveis sobre as atribuições e os cargos atribuídos.
+
+    Cada passo guarda só o que mudou: os deltas do store (recebidos pela
+    subscrição) e, se os cargos mudaram, as listas antes/depois, que partilham
+    os registos iguais. Desfazer/refazer reaplica os deltas no store (ledger,
+    cobertura e espaço de trabalho seguem pelas subscrições). As posições
+    contam passos desde o início; os pontos com nome guardam uma posição.
+    """
+
+    def __init__(self, store, limite=500):
+        self.store = store
+        self.limite = limite
+        self.passos = []      # passos[i] leva da posição base+i à base+i+1
+        self.base = 0         # passos mais antigos descartados (limite)
+        self.pos = 0
+        self.pontos = {}      # nome -> posição
+        self.pendentes = []
+        self.cargos_pend = None
+        self._a_repor = False
+        store.subscribe("historico", self.on_assignment)
+
+    def on_assignment(self, key, old, new):
+        if not self._a_repor:
+            self.pendentes.append((key, old, new))
+
+    def on_cargos(self, antes, depois):
+        """Regista a troca da lista de cargos; devolve `depois` a partilhar os registos iguais de `antes`."""
+        if self._a_repor:
+            return depois
+        ant = {_cargo_key(r, i): r for i, r in enumerate(antes)}
+        partilha = []
+        for i, r in enumerate(depois):
+            r0 = ant.get(_cargo_key(r, i))
+            partilha.append(r0 if r0 == r else r)
+        inicio = antes if self.cargos_pend is None else self.cargos_pend[0]
+        self.cargos_pend = (inicio, partilha)
+        return partilha
+
+    def commit(self, acao):
+        """Fecha as alterações pendentes num passo (nada a fechar: não cria passo)."""
+        cargos = self.cargos_pend
+        if cargos is not None and cargos[0] == cargos[1]:
+            cargos = None
+        if not self.pendentes and cargos is None:
+            self.cargos_pend = None
+            return False
+        # um passo novo depois de desfazer descarta o ramo que se podia refazer
+        del self.passos[self.pos - self.base:]
+        self.pontos = {n: p for n, p in self.pontos.items() if p <= self.pos}
+        self.passos.append(Passo(acao, tuple(self.pendentes), cargos))
+        self.pendentes, self.cargos_pend = [], None
+        self.pos += 1
+        if len(self.passos) > self.limite:
+            n = len(self.passos) - self.limite
+            del self.passos[:n]
+            self.base += n
+            self.pontos = {nome: p for nome, p in self.pontos.items() if p >= self.base}
+        return True
+
+    @contextmanager
+    def _repor(self):
+        self._a_repor = True
+        try:
+            yield
+        finally:
+            self._a_repor = False
+
+    def _aplicar(self, deltas, lado):
+        store = self.store
+        for key, *estados in deltas:
+            v = estados[lado]
+            if v is None:
+                store.delete(*key)
+            else:
+                store.upsert(key[0], v[1], v[2], key[1], v[0])
+
+    def pode_desfazer(self):
+        return self.pos > self.base
+
+    def pode_refazer(self):
+        return self.pos < self.base + len(self.passos)
+
+    def ir_para(self, pos, set_cargos):
+        """Desfaz/refaz até à posição `pos`; os cargos repõem-se por set_cargos(lista). Devolve os passos percorridos."""
+        pos = min(max(pos, self.base), self.base + len(self.passos))
+        cargos, n = None, 0
+        # um lote só sob o lock do store: um download a meio não vê um estado desfeito em parte
+        with self.store.lock, self._repor():
+            while self.pos > pos:
+                p = self.passos[self.pos - self.base - 1]
+                self._aplicar(reversed(p.deltas), 0)
+                cargos = p.cargos[0] if p.cargos is not None else cargos
+                self.pos -= 1
+                n += 1
+            while self.pos < pos:
+                p = self.passos[self.pos - self.base]
+                self._aplicar(p.deltas, 1)
+                cargos = p.cargos[1] if p.cargos is not None else cargos
+                self.pos += 1
+                n += 1
+            if cargos is not None:
+                set_cargos(cargos)
+        return n
+
+    def desfazer(self, set_cargos):
+        return self.ir_para(self.pos - 1, set_cargos)
+
+    def refazer(self, set_cargos):
+        return self.ir_para(self.pos + 1, set_cargos)
+
+    def marcar(self, nome):
+        self.pontos[nome] = self.pos
+
+    def passo_atual(self):
+        return self.passos[self.pos - self.base - 1].acao if self.pode_desfazer() else None
+
+    def passo_seguinte(self):
+        return self.passos[self.pos - self.base].acao if self.pode_refazer() else None
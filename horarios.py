@@ -0,0 +1,150 @@
+import bisect, heapq
+import pandas as pd
+from collections import defaultdict
+
+from ingest import intern, conform
+
+# dimensões de conflito: o mesmo docente, local ou turma não pode ter dois blocos sobrepostos
+DIMS = {"docente": "docente_id", "local": "local", "turma": "turma_id"}
+BLOCK_COLS = ["docente_id","dia","inicio_min","fim_min","local","turma_id","disciplina"]
+
+def fmt_hora(m):
+    return "" if pd.isna(m) else f"{int(m)//60:02d}:{int(m)%60:02d}"
+
+def _valid(b):
+    return pd.notna(b["inicio_min"]) and pd.notna(b["fim_min"]) and b["fim_min"] > b["inicio_min"]
+
+# ======================================================
+# Deteção de sobreposições (sweep-line)
+# ======================================================
+def sweep_conflicts(horarios):
+    """Todos os pares de blocos sobrepostos por docente, local e turma, em O(n log n + k).
+
+    Devolve DataFrame dim, chave, dia, bloco_a, bloco_b (índices de `horarios`).
+    """
+    h = horarios[(horarios["fim_min"] > horarios["inicio_min"]).fillna(False)]
+    out = []
+    for dim, col in DIMS.items():
+        sub = h[h[col]!=""].sort_values([col, "dia", "inicio_min"], kind="stable")
+        grp_prev = None
+        ativos = []  # heap (fim, bloco) dos blocos ainda abertos no grupo atual
+        for bid, key, dia, ini, fim in zip(sub.index, sub[col], sub["dia"], sub["inicio_min"], sub["fim_min"]):
+            if (key, dia) != grp_prev:
+                grp_prev, ativos = (key, dia), []
+            while ativos and ativos[0][0] <= ini:
+                heapq.heappop(ativos)
+            for _, b in ativos:
+                out.append((dim, key, dia, min(b, bid), max(b, bid)))
+            heapq.heappush(ativos, (fim, bid))
+    return pd.DataFrame(out, columns=["dim","chave","dia","bloco_a","bloco_b"])
+
+# ======================================================
+# Índice incremental de intervalos por (dimensão, chave, dia)
+# ======================================================
+class ScheduleIndex:
+    """Listas ordenadas por início para cada (dimensão, chave, dia), com o
+    conjunto de conflitos mantido ao editar um bloco de cada vez."""
+
+    def __init__(self, horarios):
+        self.blocks = {}
+        self.lists = defaultdict(list)   # (dim, chave, dia) -> [(inicio, fim, bloco)] ordenada
+        self.maxlen = defaultdict(int)   # maior duração por lista (limita a pesquisa para trás)
+        for bid, *vals in zip(horarios.index, *(horarios[c] for c in BLOCK_COLS)):
+            b = dict(zip(BLOCK_COLS, vals))
+            self.blocks[bid] = b
+            if _valid(b):
+                for lk in self._list_keys(b):
+                    self.lists[lk].append((int(b["inicio_min"]), int(b["fim_min"]), bid))
+                    self.maxlen[lk] = max(self.maxlen[lk], int(b["fim_min"]) - int(b["inicio_min"]))
+        for l in self.lists.values():
+            l.sort()
+        c = sweep_conflicts(horarios)
+        self.conflicts = set()
+        self.by_block = defaultdict(set)
+        for conf in zip(c["dim"], c["chave"], c["dia"], c["bloco_a"], c["bloco_b"]):
+            self._add_conflict(conf)
+        self.next_id = max(self.blocks, default=-1) + 1
+
+    def _add_conflict(self, conf):
+        self.conflicts.add(conf)
+        self.by_block[conf[3]].add(conf)
+        self.by_block[conf[4]].add(conf)
+
+    @staticmethod
+    def _list_keys(b):
+        return [(dim, b[col], b["dia"]) for dim, col in DIMS.items() if b[col] != ""]
+
+    def _overlaps(self, lk, ini, fim, bid):
+        l = self.lists.get(lk, [])
+        hi = bisect.bisect_left(l, (fim,))
+        lo = bisect.bisect_left(l, (ini - self.maxlen[lk],))
+        return [b for s, e, b in l[lo:hi] if e > ini and b != bid]
+
+    def _remove(self, bid):
+        b = self.blocks.pop(bid)
+        if _valid(b):
+            for lk in self._list_keys(b):
+                l = self.lists[lk]
+                l.pop(bisect.bisect_left(l, (int(b["inicio_min"]), int(b["fim_min"]), bid)))
+        for conf in self.by_block.pop(bid, ()):
+            self.conflicts.discard(conf)
+            other = conf[4] if conf[3] == bid else conf[3]
+            self.by_block[other].discard(conf)
+        return b
+
+    def _insert(self, bid, b):
+        self.blocks[bid] = b
+        if not _valid(b):
+            return
+        ini, fim = int(b["inicio_min"]), int(b["fim_min"])
+        for lk in self._list_keys(b):
+            for other in self._overlaps(lk, ini, fim, bid):
+                self._add_conflict((lk[0], lk[1], lk[2], min(bid, other), max(bid, other)))
+            bisect.insort(self.lists[lk], (ini, fim, bid))
+            self.maxlen[lk] = max(self.maxlen[lk], fim - ini)
+
+    def update(self, bid, **changes):
+        """Altera um bloco e atualiza só os conflitos que o envolvem."""
+        b = dict(self._remove(bid))
+        b.update(changes)
+        self._insert(bid, b)
+
+    def add(self, **block):
+        bid = self.next_id
+        self.next_id += 1
+        self._insert(bid, {c: block.get(c, "") for c in BLOCK_COLS})
+        return bid
+
+    def delete(self, bid):
+        self._remove(bid)
+
+    def blocks_df(self):
+        return pd.DataFrame.from_dict(self.blocks, orient="index", columns=BLOCK_COLS)
+
+    def conflicts_df(self):
+        return pd.DataFrame(sorted(self.conflicts, key=lambda c: (c[0], str(c[1]), str(c[2]), c[3], c[4])),
+                            columns=["dim","chave","dia","bloco_a","bloco_b"])
+
+# ======================================================
+# Cruzamento minutos no horário vs carga das atribuições
+# ======================================================
+def cross_check(horarios, assignments, matriz):
+    """Minutos marcados por (turma, disciplina) vs carga_sem_min e docente atribuído."""
+    h = horarios[(horarios["turma_id"]!="") & (horarios["disciplina"]!="") & (horarios["fim_min"] > horarios["inicio_min"]).fillna(False)]
+    h = h.assign(min_horario=(h["fim_min"]-h["inicio_min"]).astype(int))
+    marcado = intern(h.groupby(["turma_id","disciplina","docente_id"], as_index=False)["min_horario"].sum(), ["disciplina"])
+    if marcado.empty:
+        return pd.DataFrame(columns=["turma_id","disciplina","docente_id","carga_sem_min","min_horario","diferenca_min","atribuido"])
+    mat = matriz[["ciclo","ano","disciplina","carga_sem_min"]].drop_duplicates(["ciclo","ano","disciplina"])
+    assignments, mat = conform(assignments, mat)
+    atrib = assignments.merge(mat, how="left", on=["ciclo","ano","disciplina"])
+    atrib["carga_sem_min"] = atrib["carga_sem_min"].fillna(0).astype(int)
+    rep = atrib[["turma_id","disciplina","docente_id","carga_sem_min"]].merge(
+        marcado, how="outer", on=["turma_id","disciplina","docente_id"])
+    rep["carga_sem_min"] = rep["carga_sem_min"].fillna(0).astype(int)
+    rep["min_horario"] = rep["min_horario"].fillna(0).astype(int)
+    rep["diferenca_min"] = rep["min_horario"] - rep["carga_sem_min"]
+    # marcado no horário para um docente a quem a turma/disciplina não está atribuída
+    atrib_keys = set(zip(atrib["turma_id"], atrib["disciplina"], atrib["docente_id"]))
+    rep["atribuido"] = [k in atrib_keys for k in zip(rep["turma_id"], rep["disciplina"], rep["docente_id"])]
+    return rep[rep["diferenca_min"]!=0].sort_values(["docente_id","turma_id","disciplina"]).reset_index(drop=True)
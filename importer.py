@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from ingest import read_csv_robust, normalize_cols, apply_aliases, prep_distribuicao, intern, ALIASES_DIST
+from store import COLS, diff_assignments
+
+# ======================================================
+# Importação da distribuição: validação em bloco + aplicação num só lote
+# ======================================================
+OBRIGATORIAS = ["turma_id","disciplina","docente_id"]   # ciclo/ano em falta vêm da turma
+
+def read_distribuicao(data):
+    """CSV de distribuição normalizado (aliases de colunas como nos restantes ficheiros)."""
+    raw = read_csv_robust(data)
+    if raw is None:
+        raise ValueError("Não foi possível ler o CSV.")
+    falta = [c for c in OBRIGATORIAS if c not in apply_aliases(normalize_cols(raw), ALIASES_DIST).columns]
+    if falta:
+        raise ValueError(f"CSV inválido para distribuição: faltam as colunas {', '.join(falta)}.")
+    return prep_distribuicao(raw)
+
+def _txt(s):
+    return s.astype(object).fillna("").astype(str).to_numpy()
+
+def validate_distribuicao(dist, docentes, turmas, matriz):
+    """Divide a distribuição em (válidas, rejeitadas, resumo), só com joins por conjuntos.
+
+    Rejeita docente ou turma desconhecidos, ciclo/ano diferentes dos da turma,
+    (ciclo, ano, disciplina) fora da matriz e slots repetidos (fica a primeira
+    linha válida). Linhas sem docente são ignoradas. `rejeitadas` traz a linha
+    do CSV e os motivos.
+    """
+    d = dist[COLS].reset_index(drop=True)
+    n = len(d)
+    tid, disc, did = _txt(d["turma_id"]), _txt(d["disciplina"]), _txt(d["docente_id"])
+    ciclo, ano = _txt(d["ciclo"]), _txt(d["ano"])
+    sem_doc = did == ""
+
+    tur = turmas.drop_duplicates("id")
+    t_idx = pd.Index(tur["id"].astype(str)).get_indexer(tid)
+    turma_ok = t_idx >= 0
+    t_ciclo = np.append(_txt(tur["ciclo"]), "")[t_idx]
+    t_ano = np.append(_txt(tur["ano"]), "")[t_idx]
+    # ciclo/ano em branco no ficheiro: os da turma
+    ciclo = np.where(ciclo == "", t_ciclo, ciclo)
+    ano = np.where(ano == "", t_ano, ano)
+
+    mat_keys = pd.MultiIndex.from_arrays([_txt(matriz["ciclo"]), _txt(matriz["ano"]), _txt(matriz["disciplina"])])
+    checks = [
+        ("docente desconhecido", pd.Index(docentes["id"].astype(str).unique()).get_indexer(did) < 0),
+        ("turma desconhecida", ~turma_ok),
+        ("ciclo/ano diferentes dos da turma", turma_ok & ((ciclo != t_ciclo) | (ano != t_ano))),
+        ("ciclo/ano/disciplina fora da matriz", ~pd.MultiIndex.from_arrays([ciclo, ano, disc]).isin(mat_keys)),
+    ]
+    motivo = np.full(n, "", dtype=object)
+    for nome, mask in checks:
+        mask &= ~sem_doc
+        motivo[mask] = np.where(motivo[mask] == "", nome, motivo[mask] + "; " + nome)
+    ok = (motivo == "") & ~sem_doc
+    dup = np.zeros(n, dtype=bool)
+    dup[ok] = pd.DataFrame({"t": tid[ok], "d": disc[ok]}).duplicated(keep="first").to_numpy()
+    motivo[dup] = "slot repetido"
+    ok &= ~dup
+
+    out = pd.DataFrame({"turma_id": tid, "ciclo": ciclo, "ano": ano, "disciplina": disc, "docente_id": did}, columns=COLS)
+    validas = intern(out[ok].reset_index(drop=True), ["ciclo","ano","disciplina"])
+    rej = motivo != ""
+    rejeitadas = out[rej].assign(motivo=motivo[rej])
+    rejeitadas.insert(0, "linha", np.flatnonzero(rej) + 2)   # linha 1 = cabeçalho
+    resumo = {"linhas": n, "validas": int(ok.sum()), "rejeitadas": int(rej.sum()), "sem_docente": int(sem_doc.sum())}
+    resumo.update({nome: int(m.sum()) for nome, m in checks})
+    resumo["slot repetido"] = int(dup.sum())
+    return validas, rejeitadas.reset_index(drop=True), resumo
+
+def import_distribuicao(store, validas, substituir=True):
+    """Aplica as linhas válidas num só lote: substitui a distribuição ou junta-se a ela. Devolve o nº de alterações."""
+    cur = store.to_df() if substituir else store.scoped(zip(validas["turma_id"], validas["disciplina"]))
+    return store.apply(diff_assignments(cur, validas))
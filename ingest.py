@@ -0,0 +1,495 @@
+import numpy as np
+import pandas as pd
+import io, re, csv, codecs, hashlib, sys, threading, time
+from collections import OrderedDict
+
+from profiling import stage
+
+# ======================================================
+# Robust CSV reader + header normalization + aliases
+# ======================================================
+ENCODINGS = ["utf-8", "utf-8-sig", "cp1252", "latin-1"]
+SEPS = [";", ",", "\t", "|"]
+SAMPLE_BYTES = 64 * 1024
+
+def as_bytes(file_or_bytes):
+    if hasattr(file_or_bytes, "getvalue"):
+        return file_or_bytes.getvalue()
+    if hasattr(file_or_bytes, "read"):
+        return file_or_bytes.read()
+    if isinstance(file_or_bytes, (bytes, bytearray)):
+        return bytes(file_or_bytes)
+    with open(file_or_bytes, "rb") as f:
+        return f.read()
+
+def sniff_encoding(sample, complete=True):
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in ENCODINGS:
+        try:
+            # final=False tolera um carácter multibyte cortado no fim da amostra
+            codecs.getincrementaldecoder(enc)().decode(sample, final=complete)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+def sniff_sep(text):
+    lines = [l for l in text.splitlines() if l.strip()][:20]
+    if not lines:
+        return ","
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters="".join(SEPS)).delimiter
+    except csv.Error:
+        pass
+    # fallback: separador mais frequente no cabeçalho
+    counts = {s: lines[0].count(s) for s in SEPS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] > 0 else ","
+
+def read_csv_legacy(data):
+    for enc in ENCODINGS:
+        for sep in [None] + SEPS:
+            try:
+                return pd.read_csv(io.BytesIO(data), sep=sep, engine="python", encoding=enc)
+            except Exception:
+                continue
+    return None
+
+def read_csv_robust(file_or_bytes, filename="upload"):
+    data = as_bytes(file_or_bytes)
+    sample = data[:SAMPLE_BYTES]
+    enc = sniff_encoding(sample, complete=len(sample) == len(data))
+    sep = sniff_sep(codecs.getincrementaldecoder(enc)(errors="replace").decode(sample))
+    try:
+        return pd.read_csv(io.BytesIO(data), sep=sep, encoding=enc)
+    except Exception:
+        # amostra enganadora: volta à tentativa exaustiva com o parser python
+        return read_csv_legacy(data)
+
+def normalize_cols(df):
+    mapping = {}
+    for c in df.columns:
+        key = re.sub(r'[^a-z0-9]+','', str(c).strip().lower())
+        mapping[c] = key
+    return df.rename(columns=mapping)
+
+ALIASES_DOC = {
+    "id": ["id","docenteid","codigo","cod","iddocente","id_docente","num","numero","mecanografico"],
+    "nome": ["nome","docente","professor","name"],
+    "grupo": ["grupo","grupoderecrutamento","gr","codigo_grupo","grupo_codigo"],
+    "reducao79_min": ["reducao79_min","reducao79min","reducao79","art79","artigo79","art79min","artigo79min","min79"],
+    "idade": ["idade","age"],
+}
+ALIASES_TUR = {
+    "id":["id","turma","cod","codigo"],
+    "ciclo":["ciclo"],
+    "ano":["ano","serie"],
+    "curso":["curso","cursosigla","curso_sigla"],
+    "n_alunos":["nalunos","alunos","n","numalunos"],
+    "escola":["escola","estabelecimento"]
+}
+ALIASES_MAT = {
+    "ciclo":["ciclo"],
+    "ano":["ano"],
+    "disciplina":["disciplina","disc","nome"],
+    "carga_sem_min":["carga_sem_min","cargasemmin","carga","min","min_sem","minsemanais"],
+    "grupo":["grupo","grupoderecrutamento","gr"],
+}
+ALIASES_CAR = {
+    "id":["id","codigo","cod"],
+    "cargo":["cargo","funcao","função","designacao","descricao","descrição"],
+    "carga_min":["carga_min","cargamin","carga","min","minutos"]
+}
+
+ALIASES_REG = {
+    "tipo":["tipo","regra"],
+    "grupo":["grupo","gr"],
+    "valor_min":["valor_min","valormin","valor","alvo","minutos"],
+    "tolerancia_min":["tolerancia_min","toleranciamin","tolerancia"],
+    "modo":["modo"],
+    "idade_min":["idade_min","idademin","idade"],
+    "fator":["fator","factor"],
+}
+
+ALIASES_HOR = {
+    "docente_id":["docente_id","docenteid","docente","professor","iddocente"],
+    "dia":["dia","diasemana","dia_semana","day"],
+    "inicio":["inicio","incio","horainicio","hora_inicio","start"],
+    "fim":["fim","horafim","hora_fim","end"],
+    "tipo":["tipo","componente"],
+    "local":["local","sala","espaco","espao"],
+    "turma_id":["turma_id","turmaid","turma"],
+    "disciplina":["disciplina","disc"],
+}
+
+ALIASES_DIST = {
+    "turma_id":["turma_id","turmaid","turma"],
+    "ciclo":["ciclo"],
+    "ano":["ano"],
+    "disciplina":["disciplina","disc"],
+    "docente_id":["docente_id","docenteid","docente","professor"],
+}
+ALIASES_CATR = dict(ALIASES_CAR, docente_id=["docente_id","docenteid","docente"], imputacao=["imputacao","imputao"])
+
+def apply_aliases(df, aliases):
+    cols = set(df.columns)
+    ren = {}
+    for canon, alts in aliases.items():
+        if canon in cols:
+            continue
+        for a in alts:
+            if a in cols:
+                ren[a] = canon
+                break
+    if ren:
+        df = df.rename(columns=ren)
+    return df
+
+def ensure(df, cols_defaults: dict, label=""):
+    for c, default in cols_defaults.items():
+        if c not in df.columns:
+            df[c] = default
+    return df
+
+def norm_ciclo(x):
+    if pd.isna(x): return ""
+    s=str(x).strip().lower()
+    if s.startswith(("pré","pre")): return "Pré"
+    if s.startswith("1"): return "1º"
+    if s.startswith("2"): return "2º"
+    if s.startswith("3"): return "3º"
+    if s.startswith(("sec","secund")): return "Sec"
+    return str(x)
+
+def norm_ano(x):
+    if pd.isna(x): return ""
+    s=str(x).strip().lower()
+    if s.startswith(("pré","pre")): return "Pré"
+    m = re.search(r"\d+", s)
+    return m.group(0) if m else str(x)
+
+# ======================================================
+# Dicionários partilhados: colunas de dimensão como categóricas
+# ======================================================
+# Um vocabulário por domínio (ciclo, ano, ...) para todo o processo; só cresce
+# (o tamanho conta para o teto da cache partilhada, que larga tabelas para o compensar).
+# As categorias são os valores conhecidos ordenados, por isso tabelas lidas com o
+# mesmo vocabulário juntam e agrupam por códigos inteiros e ordenam como texto.
+# docente_id/turma_id ficam texto: são as chaves do AssignmentStore e dos editores.
+DIMENSOES = ["ciclo","ano","disciplina","grupo","escola","curso"]
+
+class Vocab:
+    def __init__(self):
+        self.values = set()
+        self.dtype = pd.CategoricalDtype([])
+        self.nbytes = 0     # valores guardados duas vezes: no conjunto e nas categorias
+        self.lock = threading.Lock()
+
+    def register(self, values):
+        with self.lock:
+            new = set(values) - self.values
+            if new:
+                self.values |= new
+                self.dtype = pd.CategoricalDtype(sorted(self.values))
+                self.nbytes = sys.getsizeof(self.values) + int(self.dtype.categories.memory_usage(deep=True)) \
+                    + sum(map(sys.getsizeof, self.values))
+            return self.dtype
+
+VOCAB = {d: Vocab() for d in DIMENSOES}
+
+def vocab_nbytes():
+    return sum(v.nbytes for v in VOCAB.values())
+
+def intern(df, cols=DIMENSOES):
+    """Converte as colunas de dimensão presentes em categóricas do vocabulário partilhado (nulos ficam nulos)."""
+    for c in cols:
+        if c in df.columns:
+            codes, uniq = pd.factorize(df[c])
+            uniq = [str(u) for u in uniq]
+            dtype = VOCAB[c].register(uniq)
+            pos = np.append(dtype.categories.get_indexer(uniq), -1)
+            df[c] = pd.Series(pd.Categorical.from_codes(pos[codes], dtype=dtype), index=df.index)
+    return df
+
+def conform(*dfs, cols=DIMENSOES):
+    """As mesmas tabelas com as categóricas realinhadas ao vocabulário atual (lidas antes de ele crescer)."""
+    out = []
+    for df in dfs:
+        fix = {c: VOCAB[c].dtype for c in cols if c in df.columns
+               and isinstance(df[c].dtype, pd.CategoricalDtype) and df[c].dtype != VOCAB[c].dtype}
+        out.append(df.astype(fix) if fix else df)
+    return out
+
+DIAS = ["Seg","Ter","Qua","Qui","Sex","Sáb","Dom"]
+_DIA_PREFIX = {"seg":0,"ter":1,"qua":2,"qui":3,"sex":4,"sab":5,"sáb":5,"dom":6,
+               "mon":0,"tue":1,"wed":2,"thu":3,"fri":4,"sat":5,"sun":6}
+
+def norm_dia(x):
+    if pd.isna(x): return ""
+    s=str(x).strip().lower()
+    if s[:3] in _DIA_PREFIX: return DIAS[_DIA_PREFIX[s[:3]]]
+    m = re.match(r"(\d)", s)  # 2ª = segunda ... 6ª = sexta
+    if m and 2 <= int(m.group(1)) <= 7: return DIAS[int(m.group(1))-2]
+    return str(x)
+
+def hora_min(s):
+    """'8:15', '08h15', '0815' -> minutos desde as 00:00 (vetorizado; inválidas -> NA)."""
+    p = s.astype(str).str.strip().str.extract(r"^(\d{1,2})\D?(\d{2})?")
+    h = pd.to_numeric(p[0], errors="coerce")
+    m = pd.to_numeric(p[1], errors="coerce").fillna(0)
+    return (h*60 + m).astype("Int64")
+
+# ======================================================
+# Normalização por tabela
+# ======================================================
+def map_unique(s, fn):
+    # normaliza cada valor distinto uma só vez
+    u = s.unique()
+    return s.map(dict(zip(u, map(fn, u))))
+
+def prep_docentes(df):
+    df = normalize_cols(df)
+    df = apply_aliases(df, ALIASES_DOC)
+    df = ensure(df, {"id":"", "nome":"", "grupo":"", "reducao79_min":0}, "docentes")
+    df["id"] = df["id"].astype(str)
+    df["grupo"] = df["grupo"].astype(str)
+    return intern(df, ["grupo"])
+
+def prep_turmas(df):
+    df = normalize_cols(df)
+    df = apply_aliases(df, ALIASES_TUR)
+    df = ensure(df, {"id":"", "ciclo":"", "ano":"", "curso":"", "n_alunos":0, "escola":""}, "turmas")
+    df["ciclo"] = map_unique(df["ciclo"], norm_ciclo)
+    df["ano"] = map_unique(df["ano"], norm_ano)
+    df["id"] = df["id"].astype(str)
+    return intern(df, ["ciclo","ano","curso","escola"])
+
+def prep_matriz(df):
+    df = normalize_cols(df)
+    df = apply_aliases(df, ALIASES_MAT)
+    df = ensure(df, {"ciclo":"", "ano":"", "disciplina":"", "carga_sem_min":0}, "matriz")
+    df["ciclo"] = map_unique(df["ciclo"], norm_ciclo)
+    df["ano"] = map_unique(df["ano"], norm_ano)
+    df["carga_sem_min"] = pd.to_numeric(df["carga_sem_min"], errors="coerce").fillna(0).astype(int)
+    if "grupo" in df.columns:
+        df["grupo"] = df["grupo"].fillna("").astype(str).str.replace(r"\.0$", "", regex=True)
+    return intern(df, ["ciclo","ano","disciplina","grupo"])
+
+def prep_cargos(df):
+    df = normalize_cols(df)
+    df = apply_aliases(df, ALIASES_CAR)
+    df = ensure(df, {"id":"", "cargo":"", "carga_min":0}, "cargos")
+    df["carga_min"] = pd.to_numeric(df["carga_min"], errors="coerce").fillna(0).astype(int)
+    return df
+
+def prep_regras(df):
+    df = normalize_cols(df)
+    df = apply_aliases(df, ALIASES_REG)
+    df = ensure(df, {"tipo":"alvo", "grupo":"*", "valor_min":0, "tolerancia_min":0, "modo":"remanescente", "idade_min":0, "fator":0}, "regras")
+    df["tipo"] = df["tipo"].fillna("alvo").astype(str).str.strip().str.lower()
+    df["grupo"] = df["grupo"].fillna("*").astype(str).str.strip().replace("", "*")
+    df["modo"] = df["modo"].fillna("remanescente").astype(str).str.strip().str.lower()
+    for c in ["valor_min","tolerancia_min","idade_min"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
+    df["fator"] = pd.to_numeric(df["fator"], errors="coerce").fillna(0.0).astype(float)
+    return df
+
+def prep_horarios(df):
+    df = normalize_cols(df)
+    df = apply_aliases(df, ALIASES_HOR)
+    df = ensure(df, {"docente_id":"", "dia":"", "inicio":"", "fim":"", "tipo":"", "local":"", "turma_id":"", "disciplina":""}, "horarios")
+    for c in ["docente_id","tipo","local","turma_id","disciplina"]:
+        df[c] = df[c].fillna("").astype(str).str.strip()
+    df["dia"] = map_unique(df["dia"], norm_dia)
+    df["inicio_min"] = hora_min(df["inicio"])
+    df["fim_min"] = hora_min(df["fim"])
+    return df
+
+def prep_distribuicao(df):
+    df = normalize_cols(df)
+    df = apply_aliases(df, ALIASES_DIST)
+    df = ensure(df, {"turma_id":"", "ciclo":"", "ano":"", "disciplina":"", "docente_id":""}, "distribuicao")
+    for c in ["turma_id","disciplina","docente_id"]:
+        df[c] = df[c].fillna("").astype(str).str.strip()
+    df["ciclo"] = map_unique(df["ciclo"], norm_ciclo)
+    df["ano"] = map_unique(df["ano"], norm_ano)
+    return intern(df, ["ciclo","ano","disciplina"])
+
+def prep_cargos_atr(df):
+    df = prep_cargos(df)
+    df = apply_aliases(df, ALIASES_CATR)
+    df = ensure(df, {"docente_id":"", "imputacao":"LETIVA"}, "cargos_atr")
+    df["docente_id"] = df["docente_id"].fillna("").astype(str)
+    df["imputacao"] = df["imputacao"].fillna("").astype(str).str.upper()
+    return df
+
+PREP = {"docentes": prep_docentes, "turmas": prep_turmas, "matriz": prep_matriz, "cargos": prep_cargos, "regras": prep_regras, "horarios": prep_horarios,
+        "distribuicao": prep_distribuicao, "cargos_atr": prep_cargos_atr}
+
+DEFAULTS = {
+    "docentes": [{"id":"D1","nome":"Ana Silva","grupo":"510","reducao79_min":0},
+                 {"id":"Pre1","nome":"Carla","grupo":"100","reducao79_min":0}],
+    "turmas": [{"id":"7A","ciclo":"3º","ano":"7","curso":"Reg","n_alunos":26,"escola":"Sede"},
+               {"id":"10A","ciclo":"Sec","ano":"10","curso":"CH","n_alunos":28,"escola":"Sede"}],
+    "matriz": [{"ciclo":"3º","ano":"7","disciplina":"Português","carga_sem_min":150},
+               {"ciclo":"Sec","ano":"10","disciplina":"Física","carga_sem_min":150},
+               {"ciclo":"Pré","ano":"Pré","disciplina":"At. Let.","carga_sem_min":1500}],
+    "cargos": [{"id":"C1","cargo":"Diretor de Turma","carga_min":45},
+               {"id":"C2","cargo":"Coord. Departamento","carga_min":90}],
+    "regras": [{"tipo":"alvo","grupo":"100","valor_min":1500,"tolerancia_min":0,"modo":"exato"},
+               {"tipo":"alvo","grupo":"110","valor_min":1500,"tolerancia_min":0,"modo":"exato"},
+               {"tipo":"alvo","grupo":"*","valor_min":1100,"tolerancia_min":50,"modo":"remanescente"}],
+    "horarios": [],
+    "distribuicao": [],
+    "cargos_atr": [],
+}
+
+# ======================================================
+# Tabelas derivadas
+# ======================================================
+def expand_slots(turmas, matriz):
+    """Expansão turma x disciplina (um slot por disciplina da matriz do ciclo/ano da turma)."""
+    turmas, matriz = conform(turmas, matriz, cols=["ciclo","ano"])
+    slots = turmas.merge(matriz, how="left", on=["ciclo","ano"]).dropna(subset=["disciplina"])
+    slots = slots.rename(columns={"id":"turma_id"})
+    slots["carga_sem_min"] = slots["carga_sem_min"].astype(int)
+    return slots.reset_index(drop=True)
+
+# ======================================================
+# Cache partilhada entre sessões por conteúdo (hash dos bytes carregados)
+# ======================================================
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_TTL_S = 3600
+
+def _nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class SharedCache:
+    """Cache de processo para tabelas de referência, partilhada por todas as sessões.
+
+    Os valores guardados são imutáveis por convenção: quem os lê recebe cópias
+    rasas (os dados são partilhados; o copy-on-write do pandas 3 isola alterações).
+    Entradas sem uso há mais de `ttl` segundos saem; acima de `max_bytes` sai a
+    menos usada recentemente. `extra_bytes()` é memória fora das entradas que
+    conta para o mesmo teto (o vocabulário partilhado das categóricas).
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL_S, maxsize=64, extra_bytes=lambda: 0):
+        self.max_bytes = max_bytes
+        self.extra_bytes = extra_bytes
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.data = OrderedDict()   # chave -> (valor, bytes, último uso)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.building = {}          # chave -> lock (uma só construção por chave)
+
+    def _drop(self, key):
+        _, n, _ = self.data.pop(key)
+        self.nbytes -= n
+
+    def _evict(self, now, keep=None):
+        for key in [k for k, (_, _, t) in self.data.items() if now - t > self.ttl and k != keep]:
+            self._drop(key)
+        limite = self.max_bytes - self.extra_bytes()
+        while (self.nbytes > limite or len(self.data) > self.maxsize) and len(self.data) > 1:
+            key = next(iter(self.data))
+            if key == keep:
+                self.data.move_to_end(key)
+                key = next(iter(self.data))
+            self._drop(key)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            e = self.data.get(key)
+            if e is None or now - e[2] > self.ttl:
+                if e is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self.data[key] = (e[0], e[1], now)
+            self.data.move_to_end(key)
+            self.hits += 1
+            return e[0]
+
+    def put(self, key, value):
+        now = time.monotonic()
+        with self.lock:
+            if key in self.data:
+                self._drop(key)
+            n = _nbytes(value)
+            self.data[key] = (value, n, now)
+            self.nbytes += n
+            self._evict(now, keep=key)
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self.lock:
+            klock = self.building.setdefault(key, threading.Lock())
+        with klock:
+            # outra sessão pode ter construído entretanto
+            with self.lock:
+                e = self.data.get(key)
+            if e is None:
+                value = build()
+                self.put(key, value)
+            else:
+                value = e[0]
+        with self.lock:
+            self.building.pop(key, None)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {"entradas": len(self.data), "bytes": self.nbytes, "extra_bytes": self.extra_bytes(),
+                    "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.nbytes = 0
+
+_CACHE = SharedCache(extra_bytes=vocab_nbytes)
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def empty_table(kind):
+    return PREP[kind](pd.DataFrame())
+
+def _build_table(kind, key, data):
+    with stage(f"ler:{kind}") as s:
+        raw = pd.DataFrame(DEFAULTS[kind]) if data is None else read_csv_robust(data)
+        if raw is None:
+            raw = pd.DataFrame()
+        s.rows = len(raw)
+    with stage(f"normalizar:{kind}") as s:
+        df = PREP[kind](raw)
+        s.rows = len(df)
+    df.attrs["source_key"] = key
+    return df
+
+def load_table(kind, source=None):
+    """Tabela `kind` normalizada; lê e normaliza só quando o conteúdo muda.
+
+    Sessões com o mesmo conteúdo partilham os mesmos dados (cópia rasa).
+    """
+    if source is None:
+        key, data = (kind, None), None
+    else:
+        data = as_bytes(source)
+        key = (kind, content_hash(data))
+    return _CACHE.get_or_build(key, lambda: _build_table(kind, key, data)).copy(deep=False)
+
+def slot_table(turmas, matriz):
+    """expand_slots partilhado entre sessões, por conteúdo de turmas e matriz (tal como vêm de load_table)."""
+    kt, km = turmas.attrs.get("source_key"), matriz.attrs.get("source_key")
+    if kt is None or km is None:
+        return expand_slots(turmas, matriz)
+    return _CACHE.get_or_build(("slots", kt, km), lambda: expand_slots(turmas, matriz)).copy(deep=False)
@@ -0,0 +1,115 @@
+import pandas as pd
+from collections import defaultdict
+
+GRUPOS_PRE = ["100","110"]
+FIELDS = ["letiva_from_disc_min","letiva_from_cargos_min","art79_from_cargos_min","te_from_cargos_min"]
+IMPUTACAO_FIELD = {"LETIVA": 1, "ART79": 2, "TE": 3}
+
+def norm_cargo(r):
+    return (str(r.get("docente_id", "")), str(r.get("imputacao", "")).upper(),
+            int(pd.to_numeric(r.get("carga_min", 0), errors="coerce") or 0))
+
+# ======================================================
+# Ledger incremental de cargas por docente
+# ======================================================
+class WorkloadLedger:
+    """Totais por docente (letiva disciplinas/cargos, ART79, TE) mantidos por deltas.
+
+    Cada gravação só toca os docentes afetados; refresh() recalcula as colunas
+    derivadas e o semáforo (via RuleSet) apenas para esses docentes.
+    """
+
+    def __init__(self, docentes, matriz, rules, signature=None):
+        self.signature = signature
+        self.rules = rules
+        mat = matriz[["ciclo","ano","disciplina","carga_sem_min"]].drop_duplicates(["ciclo","ano","disciplina"])
+        self.carga = dict(zip(zip(mat["ciclo"], mat["ano"], mat["disciplina"]), mat["carga_sem_min"].astype(int)))
+        cols = ["id","nome","grupo","reducao79_min"] + (["idade"] if "idade" in docentes.columns else [])
+        base = docentes[cols].copy().rename(columns={"id":"docente_id"})
+        base["docente_id"]=base["docente_id"].astype(str); base["grupo"]=base["grupo"].astype(str)
+        base["reducao79_min"]=pd.to_numeric(base["reducao79_min"], errors="coerce").fillna(0).astype(int)
+        base = base.drop_duplicates("docente_id").sort_values("docente_id")
+        for f in FIELDS:
+            base[f] = 0
+        base["letiva_total_min"] = 0
+        base["art79_total_min"] = base["reducao79_min"]
+        base["te_total_min"] = 0
+        base = base.join(rules.evaluate(base))
+        self.table = base.set_index("docente_id", drop=False)
+        self.pre = dict(zip(base["docente_id"], base["grupo"].isin(GRUPOS_PRE)))
+        self.mins = defaultdict(lambda: [0, 0, 0, 0])
+        # somas para o crédito (só docentes conhecidos)
+        self.art79_sum = {True: 0, False: 0}
+        for pre, red in zip(base["grupo"].isin(GRUPOS_PRE), base["reducao79_min"]):
+            self.art79_sum[bool(pre)] += int(red)
+        self.letiva_cargos_total = 0
+        self.cargos = []
+        self.te_global = None
+        self.dirty = set()
+
+    def _add(self, did, i, delta):
+        if not delta:
+            return
+        self.mins[did][i] += delta
+        self.dirty.add(did)
+        if i == 2 and did in self.pre:
+            self.art79_sum[bool(self.pre[did])] += delta
+
+    def on_assignment(self, key, old, new):
+        if old is not None:
+            did, ciclo, ano = old
+            self._add(did, 0, -self.carga.get((ciclo, ano, key[1]), 0))
+        if new is not None:
+            did, ciclo, ano = new
+            self._add(did, 0, self.carga.get((ciclo, ano, key[1]), 0))
+
+    def attach(self, store):
+        for key, did in store.docente.items():
+            ciclo, ano = store.meta[key]
+            self.on_assignment(key, None, (did, ciclo, ano))
+        store.subscribe("ledger", self.on_assignment)
+
+    def set_cargos(self, records):
+        new = [norm_cargo(r) for r in records]
+        for sign, rows in ((-1, self.cargos), (1, new)):
+            for did, imp, carga in rows:
+                i = IMPUTACAO_FIELD.get(imp)
+                if i is not None:
+                    self._add(did, i, sign * carga)
+        self.cargos = new
+        self.letiva_cargos_total = sum(c for _, imp, c in new if imp == "LETIVA")
+
+    def refresh(self, te_global):
+        t = self.table
+        ids = [d for d in self.dirty if d in self.pre]
+        if ids:
+            vals = pd.DataFrame([self.mins[d] for d in ids], index=ids, columns=FIELDS)
+            t.loc[ids, FIELDS] = vals
+            t.loc[ids, "letiva_total_min"] = vals["letiva_from_disc_min"] + vals["letiva_from_cargos_min"]
+            t.loc[ids, "art79_total_min"] = t.loc[ids, "reducao79_min"] + vals["art79_from_cargos_min"]
+            t.loc[ids, "te_total_min"] = int(te_global) + vals["te_from_cargos_min"]
+            ev = self.rules.evaluate(t.loc[ids])
+            t.loc[ids, ev.columns] = ev
+        self.dirty.clear()
+        if te_global != self.te_global:
+            t["te_total_min"] = int(te_global) + t["te_from_cargos_min"]
+            self.te_global = te_global
+        return t
+
+    def credito(self, n_turmas):
+        return credito_formula(n_turmas, self.art79_sum[True], self.art79_sum[False], self.letiva_cargos_total)
+
+# ======================================================
+# CRÉDITO (nova fórmula)
+# ======================================================
+def credito_formula(n_turmas, art79_pre_min, art79_outros_min, letiva_cargos_min):
+    """(total, gasto, restante) do crédito horário.
+
+    total = 7 * nº turmas (1º/2º/3º/Sec) - 0.5 * (Art79 grupos 100/110 / 60 + Art79 restantes / 50);
+    gasto = cargos imputados a LETIVA em unidades (min/60).
+    """
+    g100 = art79_pre_min / 60.0
+    g_others = art79_outros_min / 50.0
+    total = 7 * n_turmas - 0.5 * (g100 + g_others)
+    gasto = letiva_cargos_min / 60.0
+    return total, gasto, total - gasto
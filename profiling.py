@@ -0,0 +1,162 @@
+import json, threading, time, tracemalloc, weakref
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# ======================================================
+# Perfil de execução por etapas (opcional)
+# ======================================================
+# O Streamlit corre cada sessão na sua thread: o perfil ativo é por thread, e
+# stage() fora de uma execução com perfil ligado não faz nada.
+_local = threading.local()
+# o tracemalloc é global ao processo: fica ligado enquanto houver um perfil ativo
+# em alguma sessão (WeakSet: sessões que desaparecem deixam de contar)
+_ativos = weakref.WeakSet()
+_ativos_lock = threading.RLock()   # RLock: o finalize pode correr (gc) com o lock já tomado
+
+def _parar_se_vazio():
+    # list(): só conta perfis vivos (um recolhido pode ainda não ter saído do WeakSet)
+    with _ativos_lock:
+        if not list(_ativos) and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+class Profiler:
+    """Tempos, linhas e pico de memória de cada etapa, para as últimas `history` execuções.
+
+    As etapas podem ser aninhadas (ex.: ingest:docentes > ler:docentes); o pico
+    de memória é o máximo alocado acima do início da etapa (tracemalloc).
+    """
+
+    def __init__(self, history=50):
+        self.runs = deque(maxlen=history)
+        self.current = None
+        self.stack = []
+        self.t0 = time.perf_counter()
+
+    def activate(self):
+        with _ativos_lock:
+            if self not in _ativos:
+                _ativos.add(self)
+                # sessão que termina com o perfil ligado: ao ser recolhida também conta como desligar
+                weakref.finalize(self, _parar_se_vazio)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def deactivate(self):
+        """Sai dos perfis ativos; o tracemalloc só para quando não resta nenhum."""
+        with _ativos_lock:
+            if self not in _ativos:
+                return
+            _ativos.discard(self)
+        _parar_se_vazio()
+
+    def start_run(self, label=""):
+        self.activate()
+        self.current = {"label": label, "inicio": time.perf_counter(), "etapas": []}
+        self.stack = []
+        _local.profiler = self
+
+    def end_run(self, label=None):
+        if self.current is None:
+            return None
+        while self.stack:
+            self.end()
+        run = self.current
+        if label is not None:
+            run["label"] = label
+        run["total_ms"] = round((time.perf_counter() - run["inicio"]) * 1000, 2)
+        self.runs.append(run)
+        self.current = None
+        _local.profiler = None
+        return run
+
+    def begin(self, name):
+        cur, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            self.stack[-1]["_pico"] = max(self.stack[-1]["_pico"], peak)
+        tracemalloc.reset_peak()
+        rec = {"etapa": name, "nivel": len(self.stack), "inicio": time.perf_counter(), "linhas": None,
+               "_mem0": cur, "_pico": 0}
+        self.stack.append(rec)
+        return rec
+
+    def end(self, rows=None):
+        rec = self.stack.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(rec.pop("_pico"), peak)
+        if self.stack:
+            self.stack[-1]["_pico"] = max(self.stack[-1]["_pico"], peak)
+        rec["ms"] = round((time.perf_counter() - rec["inicio"]) * 1000, 2)
+        rec["pico_mem_kb"] = round(max(peak - rec.pop("_mem0"), 0) / 1024, 1)
+        if rows is not None:
+            rec["linhas"] = int(rows)
+        self.current["etapas"].append(rec)
+        return rec
+
+    def last_df(self):
+        if not self.runs:
+            return pd.DataFrame(columns=["etapa","ms","linhas","pico_mem_kb"])
+        et = sorted(self.runs[-1]["etapas"], key=lambda r: r["inicio"])
+        return pd.DataFrame([{"etapa": "  " * r["nivel"] + r["etapa"], "ms": r["ms"], "linhas": r["linhas"],
+                              "pico_mem_kb": r["pico_mem_kb"]} for r in et])
+
+    def history_df(self):
+        """ms por etapa de topo (colunas) em cada execução (linhas)."""
+        rows = [{"execucao": i, "total": r["total_ms"], **{e["etapa"]: e["ms"] for e in r["etapas"] if e["nivel"]==0}}
+                for i, r in enumerate(self.runs)]
+        return pd.DataFrame(rows).set_index("execucao") if rows else pd.DataFrame()
+
+    def to_json(self):
+        return json.dumps([{**r, "inicio": round((r["inicio"] - self.t0) * 1000, 3),
+                            "etapas": [{**e, "inicio": round((e["inicio"] - self.t0) * 1000, 3)} for e in r["etapas"]]}
+                           for r in list(self.runs)], ensure_ascii=False, indent=1)
+
+    def to_chrome_trace(self):
+        """Formato Trace Event (chrome://tracing, Perfetto): um evento completo por etapa."""
+        ev = []
+        for i, r in enumerate(list(self.runs)):
+            ev.append({"name": f"execução {i} {r['label']}", "ph": "X", "pid": 1, "tid": 1,
+                       "ts": round((r["inicio"] - self.t0) * 1e6), "dur": round(r["total_ms"] * 1000)})
+            for e in r["etapas"]:
+                ev.append({"name": e["etapa"], "ph": "X", "pid": 1, "tid": 1,
+                           "ts": round((e["inicio"] - self.t0) * 1e6), "dur": round(e["ms"] * 1000),
+                           "args": {"linhas": e["linhas"], "pico_mem_kb": e["pico_mem_kb"]}})
+        return json.dumps({"traceEvents": ev, "displayTimeUnit": "ms"})
+
+class _Stage:
+    rows = None
+
+@contextmanager
+def stage(name):
+    """Etapa com nome na execução com perfil desta thread; `s.rows = n` regista o nº de linhas."""
+    prof = getattr(_local, "profiler", None)
+    s = _Stage()
+    if prof is None or prof.current is None:
+        yield s
+        return
+    prof.begin(name)
+    try:
+        yield s
+    finally:
+        prof.end(s.rows)
+
+def begin(name):
+    """Como stage(), para blocos que não cabem num with (ex.: a cadeia de páginas)."""
+    prof = getattr(_local, "profiler", None)
+    if prof is not None and prof.current is not None:
+        prof.begin(name)
+
+def end(rows=None):
+    prof = getattr(_local, "profiler", None)
+    if prof is not None and prof.current is not None and prof.stack:
+        prof.end(rows)
+
+def disable(profiler=None):
+    """Desliga o perfil nesta thread; `profiler` (o da sessão) deixa de manter o tracemalloc ligado."""
+    _local.profiler = None
+    if profiler is not None:
+        profiler.deactivate()
+
+def n_ativos():
+    return len(_ativos)
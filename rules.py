@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# Regras de carga letiva (alvos, tolerâncias, reduções) declaradas como dados
+# ======================================================
+# tipo=alvo            -> grupo ("*" = restantes), valor_min (alvo), tolerancia_min, modo
+#                         modo "exato": completa só se letiva == alvo
+#                         modo "remanescente": completa se alvo-letiva < tolerancia; acima do alvo é assinalado
+# tipo=reducao_idade   -> alvo reduzido em valor_min se idade >= idade_min (acumula entre regras)
+# tipo=reducao_art79   -> alvo reduzido em fator * art79_total_min
+RULE_COLS = ["tipo","grupo","valor_min","tolerancia_min","modo","idade_min","fator"]
+
+class RuleSet:
+    """Regras compiladas em mapas por grupo + máscaras; avaliação vetorizada por tabela."""
+
+    def __init__(self, regras):
+        r = regras[RULE_COLS].copy()
+        alvo = r[r["tipo"]=="alvo"]
+        spec = alvo[alvo["grupo"]!="*"].drop_duplicates("grupo", keep="last").set_index("grupo")
+        self.alvo_map = spec["valor_min"].to_dict()
+        self.tol_map = spec["tolerancia_min"].to_dict()
+        self.modo_map = spec["modo"].to_dict()
+        dflt = alvo[alvo["grupo"]=="*"]
+        if dflt.empty:
+            self.default = (1100, 50, "remanescente")
+        else:
+            d = dflt.iloc[-1]
+            self.default = (int(d["valor_min"]), int(d["tolerancia_min"]), d["modo"])
+        red = r[r["tipo"]=="reducao_idade"]
+        self.idade_rules = list(zip(red["grupo"], red["idade_min"], red["valor_min"]))
+        red = r[r["tipo"]=="reducao_art79"]
+        self.art79_rules = list(zip(red["grupo"], red["fator"]))
+
+    def _grupo_mask(self, g, grupo):
+        return np.ones(len(g), dtype=bool) if grupo=="*" else (g==grupo).to_numpy()
+
+    def _parts(self, df):
+        """Por linha: alvo base, redução por idade, soma dos fatores Art.79, tolerância e modo exato."""
+        g = df["grupo"].astype(str)
+        base = g.map(self.alvo_map).fillna(self.default[0]).to_numpy(dtype=float)
+        red = np.zeros(len(df))
+        if self.idade_rules and "idade" in df.columns:
+            idade = pd.to_numeric(df["idade"], errors="coerce").to_numpy(dtype=float)
+            for grupo, idade_min, valor in self.idade_rules:
+                red += np.where(self._grupo_mask(g, grupo) & (idade>=idade_min), valor, 0)
+        f79 = np.zeros(len(df))
+        for grupo, fator in self.art79_rules:
+            f79 += np.where(self._grupo_mask(g, grupo), fator, 0)
+        tol = g.map(self.tol_map).fillna(self.default[1]).to_numpy(dtype=int)
+        exato = (g.map(self.modo_map).fillna(self.default[2])=="exato").to_numpy()
+        return base, red, f79, tol, exato
+
+    @staticmethod
+    def _alvo(base, red, f79, art79):
+        return np.maximum(base-red-f79*art79, 0).round().astype(int)
+
+    def _art79(self, df):
+        return df["art79_total_min"].to_numpy(dtype=float) if "art79_total_min" in df.columns else 0.0
+
+    def alvo(self, df):
+        base, red, f79, _, _ = self._parts(df)
+        return self._alvo(base, red, f79, self._art79(df))
+
+    def evaluate(self, df):
+        """alvo_letiva_min, semaforo e estado para todas as linhas de `df` numa só passagem."""
+        base, red, f79, tol, exato = self._parts(df)
+        alvo = self._alvo(base, red, f79, self._art79(df))
+        letiva = df["letiva_total_min"].to_numpy(dtype=int)
+        acima = ~exato & (letiva>alvo)
+        completa = np.where(exato, letiva==alvo, (alvo-letiva)<tol)
+        conds = [letiva==0, acima, completa]
+        alvo_s = pd.Series(alvo, dtype=str).to_numpy(dtype=object)
+        msg_acima = "Acima de " + alvo_s + " (+" + pd.Series(letiva-alvo, dtype=str).to_numpy(dtype=object) + ")"
+        msg_completa = np.where(exato, "Completa (" + alvo_s + " + TE)",
+                                "Completa (remanescente <" + pd.Series(tol, dtype=str).to_numpy(dtype=object) + " + TE)")
+        return pd.DataFrame({
+            "alvo_letiva_min": alvo,
+            "semaforo": np.select(conds, ["🔴","🟡","🟢"], "🟡"),
+            "estado": np.select(conds, ["Sem componente letiva", msg_acima, msg_completa], "Em preenchimento"),
+        }, index=df.index)
+
+    def semaforo_codes(self, df, letiva, art79):
+        """Semáforo como código (0 🔴, 1 🟡, 2 🟢) para matrizes cenário x docente.
+
+        `df`: uma linha por docente (grupo, idade); `letiva`, `art79`: forma (cenários, docentes).
+        """
+        base, red, f79, tol, exato = self._parts(df)
+        alvo = self._alvo(base, red, f79, art79)
+        acima = ~exato & (letiva>alvo)
+        completa = np.where(exato, letiva==alvo, (alvo-letiva)<tol)
+        return np.select([letiva==0, acima, completa], [0, 1, 2], 1).astype(np.int8)
@@ -0,0 +1,101 @@
+import math
+import numpy as np
+import pandas as pd
+
+from ledger import GRUPOS_PRE, credito_formula
+
+# ======================================================
+# Cenários "e se": TE global x imputação de cargos x redução Art.79
+# ======================================================
+IMPUTACOES = ["LETIVA","ART79","TE"]
+MAX_CENARIOS = 200_000
+BLOCO = 2000   # cenários avaliados de cada vez (limita a memória da matriz cenário x docente)
+
+def scenario_grid(te_values, fatores_art79, cargo_opcoes):
+    """Todas as combinações: te_global, fator_art79 e uma coluna cargo:<id> por cargo variado.
+
+    `cargo_opcoes`: {id do cargo: [imputações a experimentar]}.
+    """
+    dims = [list(te_values), list(fatores_art79)] + [list(v) for v in cargo_opcoes.values()]
+    n = math.prod(len(d) for d in dims)
+    if n == 0:
+        raise ValueError("Cada dimensão precisa de pelo menos um valor.")
+    if n > MAX_CENARIOS:
+        raise ValueError(f"{n} cenários (máximo {MAX_CENARIOS}); reduza a grelha.")
+    idx = np.indices([len(d) for d in dims]).reshape(len(dims), -1)
+    grid = {"te_global": np.asarray(dims[0], dtype=int)[idx[0]],
+            "fator_art79": np.asarray(dims[1], dtype=float)[idx[1]]}
+    for j, cid in enumerate(cargo_opcoes):
+        grid[f"cargo:{cid}"] = np.asarray(dims[2+j], dtype=object)[idx[2+j]]
+    return pd.DataFrame(grid)
+
+def sweep(table, cargos, rules, n_turmas, grid):
+    """Crédito, TE total e contagens do semáforo para cada linha de `grid`.
+
+    `table`: cargas por docente (WorkloadLedger.refresh / calc_cargas);
+    `cargos`: cargos atribuídos (cargos_atr_df). Os cargos que não estão na
+    grelha ficam com a imputação atual.
+    """
+    table = table.reset_index(drop=True)
+    ids = table["docente_id"].astype(str).to_numpy()
+    pos = {d: i for i, d in enumerate(ids)}
+    D = len(ids)
+    var = [c[len("cargo:"):] for c in grid.columns if c.startswith("cargo:")]
+    cargos = cargos.assign(id=cargos["id"].astype(str))
+    if set(var) - set(cargos["id"]):
+        raise ValueError("Cargo desconhecido na grelha.")
+    # cargos variados: primeira linha com cada id; os restantes ficam fixos
+    first = ~cargos["id"].duplicated() & cargos["id"].isin(var)
+    sel = cargos[first].set_index("id").loc[var]
+    fixos = cargos[~first]
+
+    def por_docente(imp):
+        v = np.zeros(D, dtype=np.int64)
+        f = fixos[fixos["imputacao"]==imp]
+        for did, c in zip(f["docente_id"], f["carga_min"]):
+            if did in pos:
+                v[pos[did]] += int(c)
+        return v
+
+    fix_let, fix_a79, fix_te = por_docente("LETIVA"), por_docente("ART79"), por_docente("TE")
+    # gasto de crédito conta todos os cargos LETIVA, com ou sem docente conhecido
+    fix_gasto = int(fixos.loc[fixos["imputacao"]=="LETIVA", "carga_min"].sum())
+    # A[c, d] = carga do cargo c se atribuído ao docente d
+    k = len(var)
+    A = np.zeros((k, D), dtype=np.int64)
+    carga = np.zeros(k, dtype=np.int64)
+    for j, (did, c) in enumerate(zip(sel["docente_id"], sel["carga_min"])):
+        carga[j] = int(c)
+        if did in pos:
+            A[j, pos[did]] = int(c)
+
+    let_disc = table["letiva_from_disc_min"].to_numpy(dtype=np.int64)
+    red79 = table["reducao79_min"].to_numpy(dtype=float)
+    pre = table["grupo"].astype(str).isin(GRUPOS_PRE).to_numpy()
+    te = grid["te_global"].to_numpy(dtype=np.int64)
+    fator = grid["fator_art79"].to_numpy(dtype=float)
+    codes = np.stack([grid[f"cargo:{c}"].map({m: i for i, m in enumerate(IMPUTACOES)}).to_numpy() for c in var], axis=1) \
+        if k else np.zeros((len(grid), 0), dtype=np.int64)
+
+    S = len(grid)
+    out = {n: np.zeros(S) for n in ["credito_total","credito_gasto","credito_restante","te_total_min"]}
+    for n in ["verde","amarelo","vermelho"]:
+        out[n] = np.zeros(S, dtype=np.int64)
+    for a in range(0, S, BLOCO):
+        b = min(a + BLOCO, S)
+        I = codes[a:b]
+        m_let, m_a79, m_te = ((I==i).astype(np.int64) for i in range(3))
+        letiva = let_disc + fix_let + m_let @ A                          # (cenários, docentes)
+        art79 = fator[a:b, None] * red79 + fix_a79 + m_a79 @ A
+        sem = rules.semaforo_codes(table, letiva, art79)
+        total, gasto, restante = credito_formula(n_turmas, art79[:, pre].sum(axis=1), art79[:, ~pre].sum(axis=1),
+                                                 fix_gasto + m_let @ carga)
+        out["credito_total"][a:b], out["credito_gasto"][a:b], out["credito_restante"][a:b] = total, gasto, restante
+        out["te_total_min"][a:b] = te[a:b] * D + fix_te.sum() + (m_te @ A).sum(axis=1)
+        out["verde"][a:b] = (sem==2).sum(axis=1)
+        out["amarelo"][a:b] = (sem==1).sum(axis=1)
+        out["vermelho"][a:b] = (sem==0).sum(axis=1)
+    res = grid.copy()
+    for n, v in out.items():
+        res[n] = v.round(2) if v.dtype.kind == "f" else v
+    return res
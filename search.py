@@ -0,0 +1,75 @@
+import bisect, unicodedata
+from collections import defaultdict
+
+# ======================================================
+# Índice de pesquisa de docentes (id / nome / grupo)
+# ======================================================
+def fold(s):
+    """Minúsculas e sem acentos ('Conceição' -> 'conceicao')."""
+    s = unicodedata.normalize("NFKD", str(s).lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+def trigrams(s):
+    return {s[i:i+3] for i in range(len(s) - 2)}
+
+class DocenteIndex:
+    """Pesquisa sem acentos por id, nome e grupo.
+
+    Consultas com menos de 3 caracteres usam um índice de prefixos (palavras
+    ordenadas + bisect); as restantes intersectam listas de trigramas e só
+    confirmam a substring nos candidatos. Resultados ordenados por relevância:
+    id exato, prefixo do id, início de palavra, substring.
+    """
+
+    def __init__(self, docentes, signature=None):
+        self.signature = signature
+        self.ids = docentes["id"].astype(str).tolist()
+        self.nomes = docentes["nome"].astype(str).tolist()
+        self.grupos = docentes["grupo"].astype(str).tolist()
+        self.ids_f = [fold(i) for i in self.ids]
+        self.text = [f"{i} {fold(n)} {fold(g)}" for i, n, g in zip(self.ids_f, self.nomes, self.grupos)]
+        self.tri = defaultdict(set)
+        words = []
+        for pos, t in enumerate(self.text):
+            for g in trigrams(t):
+                self.tri[g].add(pos)
+            words.extend((w, pos) for w in t.split())
+        words.sort()
+        self.words = words
+
+    def _prefix(self, q):
+        i = bisect.bisect_left(self.words, (q,))
+        out = set()
+        while i < len(self.words) and self.words[i][0].startswith(q):
+            out.add(self.words[i][1])
+            i += 1
+        return out
+
+    def _rank(self, pos, q):
+        i = self.ids_f[pos]
+        if i == q:
+            r = 0
+        elif i.startswith(q):
+            r = 1
+        elif any(w.startswith(q) for w in self.text[pos].split()):
+            r = 2
+        else:
+            r = 3
+        return (r, self.nomes[pos], self.ids[pos])
+
+    def search(self, q, grupo=None):
+        """Posições (linhas de `docentes`) que contêm `q`, da mais para a menos relevante."""
+        q = " ".join(fold(q).split())
+        if not q:
+            pos = range(len(self.ids))
+        elif len(q) < 3:
+            pos = self._prefix(q)
+        else:
+            sets = sorted((self.tri.get(g, set()) for g in trigrams(q)), key=len)
+            cand = set.intersection(*sets) if sets else set()
+            pos = [p for p in cand if q in self.text[p]]
+        if grupo is not None:
+            pos = [p for p in pos if self.grupos[p] == grupo]
+        if not q:
+            return list(pos)
+        return sorted(pos, key=lambda p: self._rank(p, q))
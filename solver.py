@@ -0,0 +1,150 @@
+import time, bisect
+import pandas as pd
+from collections import defaultdict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+GRUPOS_PRE = ["100","110"]
+# sem coluna grupo na matriz: Pré -> 100, 1º ciclo -> 110, restantes -> qualquer grupo não 100/110
+GRUPO_POR_CICLO = {"Pré": "100", "1º": "110"}
+QUALQUER = "*"
+
+# ======================================================
+# Distribuição automática dos slots por atribuir
+# ======================================================
+def eligible_key(slots):
+    if "grupo" in slots.columns:
+        g = slots["grupo"].astype(object).fillna("").astype(str).str.replace(" ", "")
+    else:
+        g = pd.Series("", index=slots.index)
+    fb = slots["ciclo"].astype(object).map(GRUPO_POR_CICLO).fillna(QUALQUER)
+    return g.where(g!="", fb)
+
+def _pool(key, by_grupo, nao_pre):
+    if key == QUALQUER:
+        return list(nao_pre)
+    out = []
+    for g in key.replace(",", ";").split(";"):
+        out.extend(by_grupo.get(g, ()))
+    return out
+
+def auto_distribuir(slots, docentes, time_budget=30.0):
+    """Atribui slots em aberto a docentes elegíveis sem ultrapassar o alvo letivo.
+
+    `slots`: turma_id, ciclo, ano, disciplina, carga_sem_min (+ grupo opcional) ainda por atribuir.
+    `docentes`: docente_id, grupo, alvo_letiva_min, letiva_total_min (atribuições atuais ficam fixas).
+    Best-fit decrescente por grupo de recrutamento, seguido de reparação local
+    (mover um slot para abrir espaço) enquanto houver tempo.
+    Devolve (propostas, relatório por docente, resumo).
+    """
+    t0 = time.monotonic()
+    deadline = t0 + float(time_budget)
+    cap = {d: int(a) - int(l) for d, a, l in zip(docentes["docente_id"], docentes["alvo_letiva_min"], docentes["letiva_total_min"])}
+    by_grupo = defaultdict(list)
+    for d, g in zip(docentes["docente_id"], docentes["grupo"].astype(str)):
+        by_grupo[g].append(d)
+    nao_pre = [d for g, ds in by_grupo.items() if g not in GRUPOS_PRE for d in ds]
+
+    slots = slots.assign(_key=eligible_key(slots)).sort_values("carga_sem_min", ascending=False, kind="stable")
+    dono = {}                    # índice do slot -> docente
+    por_docente = defaultdict(list)  # docente -> [(carga, índice)]
+    sobra = []                   # (índice, chave) sem lugar
+    timed_out = False
+    # chaves com menos docentes elegíveis primeiro
+    keys = sorted(slots["_key"].unique(), key=lambda k: len(_pool(k, by_grupo, nao_pre)))
+    for key in keys:
+        pool = [d for d in _pool(key, by_grupo, nao_pre) if cap.get(d, 0) > 0]
+        sub = slots[slots["_key"]==key]
+        caps = sorted((cap[d], d) for d in pool)
+        for idx, carga in zip(sub.index, sub["carga_sem_min"]):
+            if timed_out or time.monotonic() > deadline:
+                timed_out = True
+                sobra.append((idx, key))
+                continue
+            # best-fit: docente com menor capacidade que ainda comporta o slot
+            i = bisect.bisect_left(caps, (carga, ""))
+            if carga <= 0 or i == len(caps):
+                sobra.append((idx, key))
+                continue
+            c, d = caps.pop(i)
+            c -= carga
+            cap[d] = c
+            dono[idx] = d
+            por_docente[d].append((carga, idx))
+            if c > 0:
+                bisect.insort(caps, (c, d))
+
+    # reparação: mover um slot de A para B (com folga) para caber um slot em sobra em A
+    cargas = slots["carga_sem_min"]
+    restantes = []
+    for idx, key in sobra:
+        if timed_out or time.monotonic() > deadline:
+            timed_out = True
+            restantes.append(idx)
+            continue
+        carga = int(cargas[idx])
+        pool = _pool(key, by_grupo, nao_pre)
+        colocado = False
+        for a in pool:
+            if carga <= 0 or cap.get(a, 0) <= 0:
+                continue
+            if cap[a] >= carga:
+                # ganhou folga com uma troca anterior: coloca diretamente
+                por_docente[a].append((carga, idx)); dono[idx] = a; cap[a] -= carga
+                colocado = True
+                break
+            for j, (x, xidx) in enumerate(por_docente[a]):
+                if cap[a] + x < carga:
+                    continue
+                xkey = slots.at[xidx, "_key"]
+                for b in _pool(xkey, by_grupo, nao_pre):
+                    if b != a and cap.get(b, 0) >= x:
+                        por_docente[a].pop(j)
+                        por_docente[b].append((x, xidx)); dono[xidx] = b; cap[b] -= x
+                        por_docente[a].append((carga, idx)); dono[idx] = a; cap[a] += x - carga
+                        colocado = True
+                        break
+                if colocado: break
+            if colocado: break
+        if not colocado:
+            restantes.append(idx)
+
+    prop = slots.loc[list(dono), ["turma_id","ciclo","ano","disciplina","carga_sem_min"]].copy()
+    prop["docente_id"] = [dono[i] for i in prop.index]
+    rel = docentes[["docente_id","grupo","alvo_letiva_min","letiva_total_min"]].copy().rename(columns={"letiva_total_min":"letiva_antes_min"})
+    add = prop.groupby("docente_id")["carga_sem_min"].sum()
+    rel["letiva_depois_min"] = rel["letiva_antes_min"] + rel["docente_id"].map(add).fillna(0).astype(int)
+    alvo = rel["alvo_letiva_min"].clip(lower=0)
+    rel["cumprimento_pct"] = (rel["letiva_depois_min"].clip(upper=alvo) / alvo.where(alvo>0)).fillna(1.0).mul(100).round(1)
+    resumo = {
+        "slots_abertos": int(len(slots)),
+        "slots_atribuidos": int(len(prop)),
+        "slots_por_atribuir": int(len(restantes)),
+        "minutos_atribuidos": int(prop["carga_sem_min"].sum()),
+        "alvo_total_min": int(alvo.sum()),
+        "alvo_cumprido_min": int(rel["letiva_depois_min"].clip(upper=alvo).sum()),
+        "alvo_cumprido_pct": round(100.0 * float(rel["letiva_depois_min"].clip(upper=alvo).sum()) / max(int(alvo.sum()), 1), 1),
+        "tempo_s": round(time.monotonic() - t0, 2),
+        "tempo_esgotado": timed_out,
+    }
+    return prop.drop(columns=["carga_sem_min"]).reset_index(drop=True), rel, resumo
+
+# spawn: o servidor do Streamlit tem várias threads, e fork a partir dele pode deixar o filho bloqueado
+_POOL = None
+
+def auto_distribuir_async(slots, docentes, time_budget=30.0):
+    """Corre auto_distribuir num processo separado; devolve um Future."""
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _POOL.submit(auto_distribuir, slots, docentes, time_budget)
+
+def reset_pool():
+    """Descarta o processo do solver (após BrokenProcessPool ou tempo esgotado); o próximo pedido cria outro."""
+    global _POOL
+    pool, _POOL = _POOL, None
+    if pool is not None:
+        # um cálculo preso continuaria a ocupar o processo: termina-o
+        for p in list((pool._processes or {}).values()):
+            p.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,237 @@
+import threading
+
+import pandas as pd
+from collections import defaultdict, namedtuple
+
+from ingest import intern
+
+COLS = ["turma_id","ciclo","ano","disciplina","docente_id"]
+KEY = ["turma_id","disciplina"]
+
+AssignmentDiff = namedtuple("AssignmentDiff", ["add","remove","change"])
+
+# ======================================================
+# Atribuições indexadas por (turma_id, disciplina)
+# ======================================================
+class AssignmentStore:
+    """Atribuições turma/disciplina -> docente, com índices secundários.
+
+    Chave primária (turma_id, disciplina); índices por docente_id, turma_id e
+    (disciplina, ano, ciclo). A vista em DataFrame é construída uma vez por versão.
+    Cada alteração é notificada aos subscritores como fn(chave, antes, depois),
+    com antes/depois = (docente_id, ciclo, ano) ou None. As alterações (e as
+    notificações) correm sob `lock`, que quem lê o store fora da thread da
+    sessão (downloads) deve segurar.
+    """
+
+    def __init__(self, records=()):
+        self.docente = {}   # (turma_id, disciplina) -> docente_id
+        self.meta = {}      # (turma_id, disciplina) -> (ciclo, ano)
+        self.by_docente = defaultdict(set)
+        self.by_turma = defaultdict(set)
+        self.by_disc_ano = defaultdict(set)  # (disciplina, ano, ciclo) -> chaves
+        self.version = 0
+        self._df = None
+        self._df_version = -1
+        self.listeners = {}
+        self.lock = threading.RLock()
+        for r in records:
+            self.upsert(r["turma_id"], r["ciclo"], r["ano"], r["disciplina"], r["docente_id"])
+
+    def __len__(self):
+        return len(self.docente)
+
+    def __contains__(self, key):
+        return key in self.docente
+
+    def subscribe(self, name, fn):
+        self.listeners[name] = fn
+
+    def _notify(self, key, old, new):
+        for fn in self.listeners.values():
+            fn(key, old, new)
+
+    def _unindex(self, key):
+        did = self.docente.pop(key)
+        ciclo, ano = self.meta.pop(key)
+        self._discard(self.by_docente, did, key)
+        self._discard(self.by_turma, key[0], key)
+        self._discard(self.by_disc_ano, (key[1], ano, ciclo), key)
+        return did
+
+    @staticmethod
+    def _discard(index, ik, key):
+        s = index.get(ik)
+        if s is not None:
+            s.discard(key)
+            if not s:
+                del index[ik]
+
+    def upsert(self, turma_id, ciclo, ano, disciplina, docente_id):
+        with self.lock:
+            key = (str(turma_id), str(disciplina))
+            did = str(docente_id)
+            ciclo, ano = str(ciclo), str(ano)
+            old = None
+            if key in self.docente:
+                if self.docente[key] == did and self.meta[key] == (ciclo, ano):
+                    return
+                old = (self.docente[key],) + self.meta[key]
+                self._unindex(key)
+            self.docente[key] = did
+            self.meta[key] = (ciclo, ano)
+            self.by_docente[did].add(key)
+            self.by_turma[key[0]].add(key)
+            self.by_disc_ano[(key[1], ano, ciclo)].add(key)
+            self.version += 1
+            self._notify(key, old, (did, ciclo, ano))
+
+    def delete(self, turma_id, disciplina):
+        with self.lock:
+            key = (str(turma_id), str(disciplina))
+            if key not in self.docente:
+                return None
+            old = (self.docente[key],) + self.meta[key]
+            did = self._unindex(key)
+            self.version += 1
+            self._notify(key, old, None)
+            return did
+
+    def get(self, turma_id, disciplina, default=""):
+        return self.docente.get((turma_id, disciplina), default)
+
+    def lookup(self, turma_ids, disciplinas, default=""):
+        get = self.docente.get
+        return [get(k, default) for k in zip(turma_ids, disciplinas)]
+
+    def keys_for_docente(self, docente_id):
+        return set(self.by_docente.get(str(docente_id), ()))
+
+    def keys_for_turma(self, turma_id):
+        return set(self.by_turma.get(str(turma_id), ()))
+
+    def keys_for_disc_ano(self, disciplina, ano, ciclo=None):
+        if ciclo is not None:
+            return set(self.by_disc_ano.get((disciplina, ano, ciclo), ()))
+        out = set()
+        for (d, a, _), keys in self.by_disc_ano.items():
+            if d == disciplina and a == ano:
+                out |= keys
+        return out
+
+    def delete_keys(self, keys):
+        with self.lock:
+            for key in list(keys):
+                self.delete(*key)
+
+    def remove_turma(self, turma_id):
+        self.delete_keys(self.keys_for_turma(turma_id))
+
+    def remove_disc_ano(self, disciplina, ano, ciclo=None):
+        self.delete_keys(self.keys_for_disc_ano(disciplina, ano, ciclo))
+
+    def reset(self, records=()):
+        with self.lock:
+            self.delete_keys(list(self.docente))
+            for r in records:
+                self.upsert(r["turma_id"], r["ciclo"], r["ano"], r["disciplina"], r["docente_id"])
+            self.version += 1
+
+    def to_df(self):
+        """Vista colunar (cache por versão; não alterar o DataFrame devolvido).
+
+        ciclo/ano/disciplina vêm como categóricas do vocabulário partilhado, para
+        juntar com a matriz por códigos.
+        """
+        if self._df_version != self.version:
+            keys = list(self.docente)
+            meta = self.meta
+            self._df = pd.DataFrame({
+                "turma_id": [k[0] for k in keys],
+                "ciclo": [meta[k][0] for k in keys],
+                "ano": [meta[k][1] for k in keys],
+                "disciplina": [k[1] for k in keys],
+                "docente_id": [self.docente[k] for k in keys],
+            }, columns=COLS)
+            intern(self._df, ["ciclo","ano","disciplina"])
+            self._df_version = self.version
+        return self._df
+
+    def records(self):
+        return self.to_df().to_dict(orient="records")
+
+    def scoped(self, keys):
+        """Atribuições atuais para as chaves dadas (as inexistentes são ignoradas)."""
+        keys = [k for k in dict.fromkeys(keys) if k in self.docente]
+        meta = self.meta
+        return pd.DataFrame({
+            "turma_id": [k[0] for k in keys],
+            "ciclo": [meta[k][0] for k in keys],
+            "ano": [meta[k][1] for k in keys],
+            "disciplina": [k[1] for k in keys],
+            "docente_id": [self.docente[k] for k in keys],
+        }, columns=COLS)
+
+    def apply(self, diff):
+        """Aplica um AssignmentDiff num único lote."""
+        # tolist(): iterar listas Python é muito mais rápido do que Series de texto (arrow)
+        with self.lock:
+            self.delete_keys(zip(diff.remove["turma_id"].tolist(), diff.remove["disciplina"].tolist()))
+            for part in (diff.change, diff.add):
+                for t, c, a, d, did in zip(*(part[col].tolist() for col in COLS)):
+                    self.upsert(t, c, a, d, did)
+        return len(diff.add) + len(diff.remove) + len(diff.change)
+
+# ======================================================
+# Diff entre o estado atual e o resultado de um data_editor
+# ======================================================
+def _clean(df):
+    df = df[COLS].copy()
+    df["docente_id"] = df["docente_id"].fillna("")
+    for c in COLS:
+        df[c] = df[c].astype(str).str.strip()
+    return df[df["docente_id"]!=""].drop_duplicates(KEY, keep="last")
+
+def diff_assignments(current, desired):
+    """Compara as atribuições atuais de um âmbito com as pretendidas.
+
+    `current`: atribuições existentes no âmbito editado; `desired`: linhas que
+    devem ficar atribuídas (docente_id vazio = sem docente). Chaves de `current`
+    ausentes de `desired` são removidas.
+    """
+    cur, des = _clean(current), _clean(desired)
+    if cur.empty or des.empty:
+        return AssignmentDiff(add=des, remove=cur[KEY], change=des.iloc[:0])
+    m = cur.merge(des, on=KEY, how="outer", suffixes=("_old",""), indicator=True)
+    remove = m.loc[m["_merge"]=="left_only", KEY]
+    add = m.loc[m["_merge"]=="right_only", COLS]
+    both = m[m["_merge"]=="both"]
+    changed = (both["docente_id_old"]!=both["docente_id"]) | (both["ciclo_old"]!=both["ciclo"]) | (both["ano_old"]!=both["ano"])
+    return AssignmentDiff(add=add, remove=remove, change=both.loc[changed, COLS])
+
+# ======================================================
+# Gravações das páginas: estado pretendido do âmbito editado -> diff -> apply
+# ======================================================
+def save_turma(store, turma_id, ciclo, ano, edited, docente_id=None):
+    """Por turma: `edited` (disciplina, docente_id) passa a ser a distribuição da turma.
+
+    Com `docente_id`, todas as disciplinas de `edited` ficam para esse docente.
+    Devolve o nº de alterações.
+    """
+    want = edited.assign(turma_id=turma_id, ciclo=ciclo, ano=ano)
+    if docente_id is not None:
+        want = want.assign(docente_id=docente_id)
+    return store.apply(diff_assignments(store.scoped(store.keys_for_turma(turma_id)), want))
+
+def save_docente(store, docente_id, edited):
+    """Por docente: linhas de `edited` com `atribuir` passam (ou continuam) para o docente; as desmarcadas perdem-no."""
+    cur = store.scoped(zip(edited["turma_id"], edited["disciplina"]))
+    want = pd.concat([cur[cur["docente_id"]!=docente_id],
+                      edited[edited["atribuir"].astype(bool)].assign(docente_id=docente_id)], ignore_index=True)
+    return store.apply(diff_assignments(cur, want))
+
+def save_disc_ano(store, disciplina, ano, ciclo, edited, docente_id=None):
+    """Por disciplina/ano (ciclo None = todos): `edited` passa a ser a distribuição do âmbito; com `docente_id`, toda para ele."""
+    cur = store.scoped(store.keys_for_disc_ano(disciplina, ano, ciclo))
+    want = edited if docente_id is None else edited.assign(docente_id=docente_id)
+    return store.apply(diff_assignments(cur, want))
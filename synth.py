@@ -0,0 +1,177 @@
+"""Agrupamento sintético determinístico (docentes, turmas, matriz, cargos, distribuição, horários).
+
+Uso: python synth.py PASTA [--escolas 15] [--docentes 1000] [--seed 0] [--atribuido 0.85]
+
+Escreve na PASTA os CSVs com os nomes que a app e o batch.py esperam.
+"""
+import argparse, os, sys
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# Matriz curricular de referência (ciclo, anos, disciplina, min/semana, grupo)
+# ======================================================
+MATRIZ_BASE = [
+    ("Pré", ["Pré"], "At. Let.", 1500, "100"),
+    ("1º", ["1","2","3","4"], "Ensino 1º ciclo", 1500, "110"),
+    ("1º", ["3","4"], "Inglês", 120, "120"),
+    ("2º", ["5","6"], "Português", 250, "200"),
+    ("2º", ["5","6"], "HGP", 150, "200"),
+    ("2º", ["5","6"], "Inglês", 150, "220"),
+    ("2º", ["5","6"], "Matemática", 250, "230"),
+    ("2º", ["5","6"], "Ciências Naturais", 150, "230"),
+    ("2º", ["5","6"], "Educação Visual", 100, "240"),
+    ("2º", ["5","6"], "Educação Tecnológica", 100, "240"),
+    ("2º", ["5","6"], "Educação Musical", 100, "250"),
+    ("2º", ["5","6"], "Educação Física", 150, "260"),
+    ("3º", ["7","8","9"], "Português", 200, "300"),
+    ("3º", ["7","8","9"], "Francês", 150, "320"),
+    ("3º", ["7","8","9"], "Inglês", 150, "330"),
+    ("3º", ["7","8","9"], "História", 150, "400"),
+    ("3º", ["7","8","9"], "Geografia", 150, "420"),
+    ("3º", ["7","8","9"], "Matemática", 200, "500"),
+    ("3º", ["7","8","9"], "Físico-Química", 150, "510"),
+    ("3º", ["7","8","9"], "Ciências Naturais", 150, "520"),
+    ("3º", ["7","8","9"], "TIC", 50, "550"),
+    ("3º", ["7","8","9"], "Educação Visual", 100, "600"),
+    ("3º", ["7","8","9"], "Educação Física", 150, "620"),
+    ("Sec", ["10","11","12"], "Português", 200, "300"),
+    ("Sec", ["10","11"], "Inglês", 150, "330"),
+    ("Sec", ["10","11"], "Filosofia", 150, "410"),
+    ("Sec", ["10","11","12"], "Matemática A", 250, "500"),
+    ("Sec", ["10","11"], "Física e Química A", 300, "510"),
+    ("Sec", ["10","11"], "Biologia e Geologia", 300, "520"),
+    ("Sec", ["10","11","12"], "Educação Física", 150, "620"),
+]
+# peso de cada ciclo no total de turmas
+PESO_CICLO = {"Pré": 0.10, "1º": 0.30, "2º": 0.15, "3º": 0.25, "Sec": 0.20}
+CARGOS_BASE = [("Diretor de Turma", 90), ("Coord. Departamento", 150), ("Coord. Diretores de Turma", 90),
+               ("Adjunto Direção", 300), ("Coord. Estabelecimento", 120), ("Biblioteca", 90), ("Desporto Escolar", 135)]
+NOMES = ["Ana","João","Maria","Inês","Pedro","Rita","Tomé","Conceição","Gonçalo","Lúcia","Sérgio","Beatriz",
+         "Álvaro","Joana","Rui","Teresa","Nuno","Susana","André","Cláudia"]
+APELIDOS = ["Silva","Santos","Ferreira","Pereira","Oliveira","Costa","Rodrigues","Martins","Gonçalves","Araújo",
+            "Sá","Simões","Lopes","Marques","Fonseca","Brandão","Guimarães","Magalhães","Conceição","Antunes"]
+ALVO_SINTETICO = {"100": 1500, "110": 1500}   # restantes 1100 (regras por omissão)
+DIAS = ["Seg","Ter","Qua","Qui","Sex"]
+TEMPOS = [(8*60+15 + 55*i, 8*60+15 + 55*i + 50) for i in range(10)]   # tempos de 50 min
+
+def matriz_df():
+    rows = [(c, a, d, m, g) for c, anos, d, m, g in MATRIZ_BASE for a in anos]
+    return pd.DataFrame(rows, columns=["ciclo","ano","disciplina","carga_sem_min","grupo"])
+
+def gerar(n_escolas=1, n_docentes=80, seed=0, atribuido=0.85):
+    """Dict kind -> DataFrame (esquemas dos CSVs de entrada), igual para os mesmos argumentos."""
+    rng = np.random.default_rng(seed)
+    matriz = matriz_df()
+    carga_turma = matriz.groupby(["ciclo","ano"])["carga_sem_min"].sum()
+
+    # turmas: nº proporcional aos docentes (carga por turma / ~1100 min por docente)
+    min_medio = float(sum(PESO_CICLO[c] * carga_turma[c].mean() for c in PESO_CICLO))
+    n_turmas = max(len(PESO_CICLO), int(round(n_docentes * 1100 * 0.9 / min_medio)))
+    # sede (escola 0) com 2º/3º/Sec; restantes escolas com Pré/1º (e 2º/3º em EB 2,3)
+    escolas = [f"E{i:02d}" for i in range(n_escolas)]
+    basicas = escolas[1:] or escolas
+    eb23 = escolas[: max(1, n_escolas // 4)]
+    turmas = []
+    for ciclo, peso in PESO_CICLO.items():
+        anos = sorted(carga_turma[ciclo].index)
+        pool = basicas if ciclo in ("Pré","1º") else (escolas[:1] if ciclo=="Sec" else eb23)
+        for k in range(max(1, int(round(n_turmas * peso)))):
+            ano = anos[k % len(anos)]
+            esc = pool[int(rng.integers(len(pool)))]
+            turmas.append({"id": f"{esc}-{ano}{chr(65 + k // len(anos) % 26)}{k // (26 * len(anos)) or ''}",
+                           "ciclo": ciclo, "ano": ano, "curso": "Reg" if ciclo!="Sec" else rng.choice(["CT","LH","SE"]),
+                           "n_alunos": int(rng.integers(18, 29)), "escola": esc})
+    turmas = pd.DataFrame(turmas)
+
+    # docentes por grupo, proporcionais aos minutos pedidos por grupo
+    slots = turmas.rename(columns={"id":"turma_id"}).merge(matriz, on=["ciclo","ano"])
+    proc = slots.groupby("grupo")["carga_sem_min"].sum()
+    alvo = proc.index.map(lambda g: ALVO_SINTETICO.get(g, 1100)).to_numpy()
+    n_g = np.maximum(1, np.round(proc.to_numpy() / alvo / proc.div(alvo).sum() * n_docentes)).astype(int)
+    grupos = np.repeat(proc.index.to_numpy(), n_g)[:n_docentes]
+    if len(grupos) < n_docentes:
+        grupos = np.concatenate([grupos, rng.choice(proc.index.to_numpy(), n_docentes - len(grupos))])
+    idade = rng.integers(28, 67, n_docentes)
+    docentes = pd.DataFrame({
+        "id": [f"D{i:04d}" for i in range(n_docentes)],
+        "nome": [f"{NOMES[a]} {APELIDOS[b]} {APELIDOS[c]}" for a, b, c in
+                 zip(rng.integers(len(NOMES), size=n_docentes), rng.integers(len(APELIDOS), size=n_docentes),
+                     rng.integers(len(APELIDOS), size=n_docentes))],
+        "grupo": grupos,
+        "reducao79_min": np.select([idade>=60, idade>=55, idade>=50], [200, 150, 100], 0),
+        "idade": idade,
+    })
+
+    # distribuição: parte dos slots atribuída a docentes do grupo com capacidade
+    cap = dict(zip(docentes["id"], docentes["grupo"].map(lambda g: ALVO_SINTETICO.get(g, 1100))))
+    por_grupo = docentes.groupby("grupo")["id"].apply(list).to_dict()
+    ordem = rng.permutation(len(slots))
+    escolhe = rng.random(len(slots)) < atribuido
+    dono = np.full(len(slots), "", dtype=object)
+    g_arr, c_arr = slots["grupo"].to_numpy(), slots["carga_sem_min"].to_numpy()
+    for i in ordem:
+        if not escolhe[i]:
+            continue
+        cands = por_grupo.get(g_arr[i], [])
+        for j in rng.permutation(len(cands))[:8]:
+            d = cands[j]
+            if cap[d] >= c_arr[i]:
+                cap[d] -= c_arr[i]
+                dono[i] = d
+                break
+    slots["docente_id"] = dono
+    dist = slots.loc[slots["docente_id"]!="", ["turma_id","ciclo","ano","disciplina","docente_id"]].reset_index(drop=True)
+
+    # cargos: catálogo + atribuições (DT por turma do 2º/3º/Sec, restantes por escola)
+    cargos = pd.DataFrame([{"id": f"C{i+1}", "cargo": c, "carga_min": m} for i, (c, m) in enumerate(CARGOS_BASE)])
+    imp = ["LETIVA","ART79","TE"]
+    atr = []
+    dt = turmas[turmas["ciclo"].isin(["2º","3º","Sec"])]["id"]
+    for k, tid in enumerate(dt):
+        atr.append({"id": f"DT-{tid}", "cargo": f"Diretor de Turma {tid}", "carga_min": 90,
+                    "docente_id": docentes["id"].iat[int(rng.integers(n_docentes))], "imputacao": imp[k % 3]})
+    for esc in escolas:
+        for i, (c, m) in enumerate(CARGOS_BASE[1:], start=2):
+            atr.append({"id": f"C{i}-{esc}", "cargo": f"{c} {esc}", "carga_min": m,
+                        "docente_id": docentes["id"].iat[int(rng.integers(n_docentes))],
+                        "imputacao": imp[int(rng.integers(3))]})
+    cargos_atr = pd.DataFrame(atr)
+
+    # horários: blocos de 50 min por turma em tempos livres da turma (docentes podem colidir)
+    blocos = []
+    ocupado = {}
+    sl = slots[slots["docente_id"]!=""]
+    for tid, disc, did, carga, esc in zip(sl["turma_id"], sl["disciplina"], sl["docente_id"], sl["carga_sem_min"], sl["escola"]):
+        livres = ocupado.setdefault(tid, [(d, t) for d in range(len(DIAS)) for t in range(len(TEMPOS))])
+        for _ in range(min(int(carga) // 50, len(livres))):
+            d, t = livres.pop(int(rng.integers(len(livres))))
+            blocos.append({"docente_id": did, "dia": DIAS[d], "inicio": f"{TEMPOS[t][0]//60:02d}:{TEMPOS[t][0]%60:02d}",
+                           "fim": f"{TEMPOS[t][1]//60:02d}:{TEMPOS[t][1]%60:02d}", "tipo": "LETIVA",
+                           "local": f"{esc}-S{int(rng.integers(1, 31))}", "turma_id": tid, "disciplina": disc})
+    horarios = pd.DataFrame(blocos, columns=["docente_id","dia","inicio","fim","tipo","local","turma_id","disciplina"])
+
+    return {"docentes": docentes, "turmas": turmas, "matriz": matriz, "cargos": cargos,
+            "distribuicao": dist, "cargos_atr": cargos_atr, "horarios": horarios}
+
+def escrever(dados, pasta):
+    from engine import FICHEIROS
+    os.makedirs(pasta, exist_ok=True)
+    for kind, df in dados.items():
+        df.to_csv(os.path.join(pasta, FICHEIROS[kind]), index=False)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Gera um agrupamento sintético determinístico.")
+    ap.add_argument("pasta")
+    ap.add_argument("--escolas", type=int, default=1)
+    ap.add_argument("--docentes", type=int, default=80)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--atribuido", type=float, default=0.85, help="fração de slots já atribuídos")
+    args = ap.parse_args(argv)
+    dados = gerar(args.escolas, args.docentes, args.seed, args.atribuido)
+    escrever(dados, args.pasta)
+    print(", ".join(f"{k}: {len(v)}" for k, v in dados.items()), "->", args.pasta)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import random
+
+import pandas as pd
+import pytest
+
+from store import AssignmentStore, diff_assignments, save_turma, save_docente, save_disc_ano
+
+# ======================================================
+# Gravações das páginas (save_*, as funções que a app usa) vs. os ciclos linha a linha anteriores
+# ======================================================
+DISCIPLINAS = ["Português","Matemática","Inglês","História","Geografia","Ciências","Físico-Química","Ed. Física","TIC","EV"]
+
+def _slots(n_turmas):
+    rows = []
+    for t in range(n_turmas):
+        ano = str(7 + t % 3)
+        for d in DISCIPLINAS:
+            rows.append({"turma_id": f"T{t}", "ciclo": "3º", "ano": ano, "disciplina": d})
+    return pd.DataFrame(rows)
+
+def _par(slots, seed=0, n_docentes=100, atribuido=0.7):
+    """Dois stores iguais com uma distribuição aleatória sobre os slots."""
+    rnd = random.Random(seed)
+    recs = [dict(r, docente_id=f"D{rnd.randrange(n_docentes)}") for r in slots.to_dict(orient="records") if rnd.random() < atribuido]
+    return AssignmentStore(recs), AssignmentStore(recs)
+
+def _estado(store):
+    return dict(store.docente), dict(store.meta)
+
+@pytest.fixture(scope="module")
+def slots():
+    return _slots(300)
+
+def test_por_turma_guardar(slots):
+    antigo, novo = _par(slots)
+    rnd = random.Random(1)
+    for turma in ["T0","T1","T7"]:
+        sub = slots[slots["turma_id"]==turma]
+        ciclo, ano = sub["ciclo"].iloc[0], sub["ano"].iloc[0]
+        edited = pd.DataFrame({"disciplina": sub["disciplina"].tolist(),
+                               "docente_id": [rnd.choice(["", "D1", "D2", "D3"]) for _ in range(len(sub))]})
+        antigo.remove_turma(turma)
+        for disc, did in zip(edited["disciplina"], edited["docente_id"]):
+            if str(did).strip()!="":
+                antigo.upsert(turma, ciclo, ano, disc, did)
+        save_turma(novo, turma, ciclo, ano, edited)
+    assert _estado(novo) == _estado(antigo)
+
+def test_por_turma_aplicar(slots):
+    antigo, novo = _par(slots)
+    sub = slots[slots["turma_id"]=="T5"]
+    ciclo, ano = sub["ciclo"].iloc[0], sub["ano"].iloc[0]
+    antigo.remove_turma("T5")
+    for d in sub["disciplina"]:
+        antigo.upsert("T5", ciclo, ano, d, "D9")
+    df = sub[["disciplina"]].assign(docente_id=novo.lookup(["T5"]*len(sub), sub["disciplina"]))
+    save_turma(novo, "T5", ciclo, ano, df, "D9")
+    assert _estado(novo) == _estado(antigo)
+
+def _por_docente(slots, seed):
+    antigo, novo = _par(slots, seed)
+    rnd = random.Random(seed)
+    sel = "D3"
+    edited = slots.copy()
+    edited["atribuido_a"] = novo.lookup(edited["turma_id"], edited["disciplina"])
+    # marcadas: as que já são do docente (algumas desmarcadas) e outras ao acaso
+    edited["atribuir"] = [(a==sel) != (rnd.random() < 0.1) for a in edited["atribuido_a"]]
+    for t, c, a, d, atrib in zip(edited["turma_id"], edited["ciclo"], edited["ano"], edited["disciplina"], edited["atribuir"]):
+        if bool(atrib):
+            antigo.upsert(t, c, a, d, sel)
+        elif antigo.get(t, d)==sel:
+            antigo.delete(t, d)
+    save_docente(novo, sel, edited)
+    assert _estado(novo) == _estado(antigo)
+
+def test_por_docente(slots):
+    _por_docente(slots, 2)
+
+def test_por_docente_50k():
+    _por_docente(_slots(5000), 3)   # 50 000 linhas candidatas
+
+def _disc_ano(store, slots, disc, ano):
+    tsub = slots[(slots["disciplina"]==disc) & (slots["ano"]==ano)].reset_index(drop=True)
+    tsub["docente_id"] = store.lookup(tsub["turma_id"], tsub["disciplina"])
+    return tsub
+
+def test_disciplina_ano_guardar(slots):
+    antigo, novo = _par(slots)
+    rnd = random.Random(4)
+    edited = _disc_ano(novo, slots, "Inglês", "8")
+    edited["docente_id"] = [rnd.choice([did, "", "D5"]) for did in edited["docente_id"]]
+    antigo.remove_disc_ano("Inglês", "8")
+    for t, c, a, d, did in zip(edited["turma_id"], edited["ciclo"], edited["ano"], edited["disciplina"], edited["docente_id"]):
+        did = str(did).strip()
+        if did=="":
+            continue
+        antigo.upsert(t, c, a, d, did)
+    save_disc_ano(novo, "Inglês", "8", None, edited)
+    assert _estado(novo) == _estado(antigo)
+
+def test_disciplina_ano_aplicar_total(slots):
+    antigo, novo = _par(slots)
+    edited = _disc_ano(novo, slots, "TIC", "9")
+    antigo.remove_disc_ano("TIC", "9", "3º")
+    for t, c, a, d in zip(edited["turma_id"], edited["ciclo"], edited["ano"], edited["disciplina"]):
+        antigo.upsert(t, c, a, d, "D7")
+    save_disc_ano(novo, "TIC", "9", "3º", edited, "D7")
+    assert _estado(novo) == _estado(antigo)
+
+def test_diff_sem_alteracoes(slots):
+    _, store = _par(slots)
+    cur = store.scoped(store.keys_for_turma("T2"))
+    diff = diff_assignments(cur, cur)
+    assert len(diff.add) == len(diff.remove) == len(diff.change) == 0
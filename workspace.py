@@ -0,0 +1,194 @@
+import json, os, re, sqlite3, threading, time
+
+from store import AssignmentStore
+
+# ======================================================
+# Espaço de trabalho persistente (SQLite em modo WAL)
+# ======================================================
+# snap_*: último instantâneo compactado; log_*: alterações posteriores, só acrescentadas.
+# O estado atual é o instantâneo + as linhas do log com seq acima da marca em meta.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snap_dist (
+    turma_id TEXT, disciplina TEXT, ciclo TEXT, ano TEXT, docente_id TEXT,
+    PRIMARY KEY (turma_id, disciplina)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snap_cargos (id TEXT PRIMARY KEY, dados TEXT) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS log_dist (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, acao TEXT,
+    turma_id TEXT, disciplina TEXT, ciclo TEXT, ano TEXT, docente_id TEXT);
+CREATE TABLE IF NOT EXISTS log_cargos (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, acao TEXT, id TEXT, dados TEXT);
+"""
+SNAPSHOT_EVERY = 5000   # alterações no log antes de compactar
+# a app só abre espaços de trabalho por nome, dentro desta pasta
+WORKSPACE_DIR = os.environ.get("DISTRIBUICAO_WORKSPACE_DIR", "espacos_trabalho")
+NOME_RE = re.compile(r"[\w-]{1,64}")
+POSSE_S = 60   # sem execuções da sessão dona há mais do que isto, outra sessão pode abrir o espaço de trabalho
+
+def _json(v):
+    return v.item() if hasattr(v, "item") else str(v)
+
+def _cargos_map(records):
+    # cargos atribuídos indexados por id (posição se o id faltar), serializados de forma canónica
+    out = {}
+    for i, r in enumerate(records):
+        k = str(r.get("id") or f"#{i}")
+        out[k] = json.dumps(r, sort_keys=True, ensure_ascii=False, default=_json)
+    return out
+
+class Workspace:
+    """Distribuição e cargos atribuídos guardados num ficheiro SQLite.
+
+    Cada gravação escreve só o delta (chaves alteradas) no log; quando o log
+    passa SNAPSHOT_EVERY linhas é compactado num novo instantâneo.
+    """
+
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY, nome=None):
+        self.path = path
+        self.nome = nome
+        self.snapshot_every = snapshot_every
+        # o Streamlit pode correr reruns da mesma sessão em threads diferentes
+        self.con = sqlite3.connect(path, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.executescript(SCHEMA)
+        self.pending = {}   # (turma_id, disciplina) -> (ciclo, ano, docente_id) ou None
+        self.cargos = {}    # id -> json (estado já persistido)
+        self.lock = threading.RLock()
+        self.visto = time.time()   # última execução da sessão dona (commit)
+        self.revogado = False      # outra sessão tomou posse: deixa de gravar
+
+    def _meta(self, k, default=0):
+        row = self.con.execute("SELECT v FROM meta WHERE k=?", (k,)).fetchone()
+        return int(row[0]) if row else default
+
+    def _log_len(self):
+        n = 0
+        for tab, k in (("log_dist", "snap_dist_seq"), ("log_cargos", "snap_cargos_seq")):
+            n += self.con.execute(f"SELECT COUNT(*) FROM {tab} WHERE seq > ?", (self._meta(k),)).fetchone()[0]
+        return n
+
+    def load(self):
+        """Reconstrói (AssignmentStore, lista de cargos atribuídos) a partir do disco."""
+        cur = self.con.cursor()
+        dist = {(t, d): (c, a, did) for t, d, c, a, did in
+                cur.execute("SELECT turma_id, disciplina, ciclo, ano, docente_id FROM snap_dist")}
+        for t, d, c, a, did in cur.execute(
+                "SELECT turma_id, disciplina, ciclo, ano, docente_id FROM log_dist WHERE seq > ? ORDER BY seq",
+                (self._meta("snap_dist_seq"),)):
+            if did is None:
+                dist.pop((t, d), None)
+            else:
+                dist[(t, d)] = (c, a, did)
+        cargos = dict(cur.execute("SELECT id, dados FROM snap_cargos"))
+        for k, dados in cur.execute("SELECT id, dados FROM log_cargos WHERE seq > ? ORDER BY seq",
+                                    (self._meta("snap_cargos_seq"),)):
+            if dados is None:
+                cargos.pop(k, None)
+            else:
+                cargos[k] = dados
+        store = AssignmentStore()
+        for (t, d), (c, a, did) in dist.items():
+            store.upsert(t, c, a, d, did)
+        self.cargos = cargos
+        self.pending = {}
+        return store, [json.loads(v) for v in cargos.values()]
+
+    def attach(self, store):
+        store.subscribe("workspace", self.on_assignment)
+
+    def on_assignment(self, key, old, new):
+        self.pending[key] = None if new is None else (new[1], new[2], new[0])
+
+    def commit(self, acao, store, cargos_atr=()):
+        """Grava as alterações pendentes da distribuição e o delta dos cargos numa transação."""
+        with self.lock:
+            if self.revogado:
+                return 0
+            self.visto = time.time()
+            return self._commit(acao, store, cargos_atr)
+
+    def _commit(self, acao, store, cargos_atr):
+        novos = _cargos_map(cargos_atr)
+        car = [(k, v) for k, v in novos.items() if self.cargos.get(k) != v]
+        car += [(k, None) for k in self.cargos if k not in novos]
+        if not self.pending and not car:
+            return 0
+        ts = time.time()
+        dist = [(ts, acao, t, d) + (v if v is not None else (None, None, None)) for (t, d), v in self.pending.items()]
+        with self.con:
+            self.con.executemany("INSERT INTO log_dist (ts, acao, turma_id, disciplina, ciclo, ano, docente_id) "
+                                 "VALUES (?,?,?,?,?,?,?)", dist)
+            self.con.executemany("INSERT INTO log_cargos (ts, acao, id, dados) VALUES (?,?,?,?)",
+                                 [(ts, acao, k, v) for k, v in car])
+        self.pending = {}
+        self.cargos = novos
+        if self._log_len() > self.snapshot_every:
+            self.compact(store)
+        return len(dist) + len(car)
+
+    def compact(self, store):
+        """Novo instantâneo com o estado atual; descarta o log que ele cobre."""
+        df = store.to_df()
+        with self.con:
+            dseq = self.con.execute("SELECT COALESCE(MAX(seq), 0) FROM log_dist").fetchone()[0]
+            cseq = self.con.execute("SELECT COALESCE(MAX(seq), 0) FROM log_cargos").fetchone()[0]
+            self.con.execute("DELETE FROM snap_dist")
+            self.con.executemany("INSERT INTO snap_dist VALUES (?,?,?,?,?)",
+                                 zip(df["turma_id"], df["disciplina"], df["ciclo"], df["ano"], df["docente_id"]))
+            self.con.execute("DELETE FROM snap_cargos")
+            self.con.executemany("INSERT INTO snap_cargos VALUES (?,?)", self.cargos.items())
+            self.con.executemany("INSERT OR REPLACE INTO meta VALUES (?,?)",
+                                 [("snap_dist_seq", str(dseq)), ("snap_cargos_seq", str(cseq))])
+            self.con.execute("DELETE FROM log_dist WHERE seq <= ?", (dseq,))
+            self.con.execute("DELETE FROM log_cargos WHERE seq <= ?", (cseq,))
+
+    def revoke(self):
+        """Deixa de gravar (outra sessão tomou posse do ficheiro)."""
+        with self.lock:
+            if not self.revogado:
+                self.revogado = True
+                self.con.close()
+
+    def close(self):
+        with _abertos_lock:
+            if _abertos.get(self.path) is self:
+                del _abertos[self.path]
+        self.revoke()
+
+# ======================================================
+# Espaços de trabalho da app: por nome, um por sessão de cada vez
+# ======================================================
+# cada sessão tem o seu store em memória: duas sessões no mesmo ficheiro gravariam
+# deltas intercalados e cada uma apagaria o trabalho da outra ao recarregar. Quem abre
+# fica com a posse; outra sessão pode tomá-la (ex.: o mesmo utilizador depois de
+# recarregar a página), e a anterior deixa de gravar.
+_abertos = {}   # caminho -> Workspace com a posse
+_abertos_lock = threading.Lock()
+
+class WorkspaceEmUso(ValueError):
+    pass
+
+def workspace_path(nome):
+    if not NOME_RE.fullmatch(nome):
+        raise ValueError(f"Nome de espaço de trabalho inválido: '{nome}' (só letras, números, _ e -; até 64).")
+    return os.path.join(WORKSPACE_DIR, f"{nome}.sqlite")
+
+def open_workspace(nome, tomar=False):
+    """Abre o espaço de trabalho `nome` em WORKSPACE_DIR e fica com a posse.
+
+    ValueError se o nome for inválido; WorkspaceEmUso se outra sessão o usou nos
+    últimos POSSE_S segundos e `tomar` for falso. Com `tomar`, a sessão anterior
+    deixa de gravar (Workspace.revogado).
+    """
+    path = os.path.abspath(workspace_path(nome))
+    with _abertos_lock:
+        dono = _abertos.get(path)
+        if dono is not None and not dono.revogado:
+            if not tomar and time.time() - dono.visto < POSSE_S:
+                raise WorkspaceEmUso(f"O espaço de trabalho '{nome}' está aberto noutra sessão.")
+            dono.revoke()
+        os.makedirs(WORKSPACE_DIR, exist_ok=True)
+        ws = Workspace(path, nome=nome)
+        _abertos[path] = ws
+    return ws